@@ -1,349 +1,3970 @@
-import sys
-import os
-import glob
-import csv
-import shutil
-from colorama import init, Fore, Back, Style
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from openpyxl.utils import get_column_letter
-
-# 初始化colorama，支持Windows系统
-init(autoreset=True)
-
-
-# 颜色代码定义（结合colorama和ANSI转义码）
-class Colors:
-    # 使用ANSI转义码代替可能不支持的Style属性
-    HEADER = Fore.MAGENTA + Style.BRIGHT
-    OKBLUE = Fore.BLUE
-    OKGREEN = Fore.GREEN
-    WARNING = Fore.YELLOW
-    FAIL = Fore.RED
-    ENDC = Style.RESET_ALL
-    BRIGHT = Style.BRIGHT
-    # 使用ANSI转义码实现下划线效果
-    UNDERLINE = '\033[4m'
-    PURPLE = Fore.MAGENTA
-
-
-def print_colored_art():
-    """打印彩色ASCII艺术和作者信息"""
-    # 定义ASCII艺术图案
-    ascii_art = [
-        " _____              _ ____                   _   _  __ _           ",
-        "| ____|_  _____ ___| | __ )  ___  __ _ _   _| |_(_)/ _(_) ___ _ __  ",
-        "|  _| \\ \\/ / __/ _ \\ |  _ \\ / _ \\/ _` | | | | __| | |_| |/ _ \\ '__| ",
-        "| |___ >  < (_|  __/ | |_) |  __/ (_| | |_| | |_| |  _| |  __/ |    ",
-        "|_____/_/\\_\\___\\___|_|____/ \\___|\\__,_|\\__,_|\\__|_|_| |_|\\___|_|    "
-    ]
-
-    # 定义作者信息
-    author_info = [
-        "Author: Bifish",
-        "Github: https://github.com/Bifish0"
-    ]
-
-    # 计算最长行的长度
-    max_length = max(len(line) for line in ascii_art + author_info)
-
-    # 打印顶部装饰线
-    print(Fore.CYAN + "=" * (max_length + 4))
-
-    # 打印ASCII艺术，使用绿色
-    for line in ascii_art:
-        padded_line = line.ljust(max_length)
-        print(Fore.GREEN + f"| {padded_line} |")
-
-    # 打印分隔线
-    print(Fore.CYAN + "|" + "-" * (max_length + 2) + "|")
-
-    # 打印作者信息，使用黄色
-    for info in author_info:
-        padded_info = info.center(max_length)
-        print(Fore.YELLOW + f"| {padded_info} |")
-
-    # 打印底部装饰线
-    print(Fore.CYAN + "=" * (max_length + 4))
-
-    # 重置颜色
-    print(Style.RESET_ALL)
-
-
-def print_colored(text, color):
-    """带颜色打印文本"""
-    print(f"{color}{text}{Colors.ENDC}")
-
-
-def print_header(text):
-    """打印标题样式文本"""
-    print("\n" + "=" * 50)
-    print_colored(f"{text:^50}", Colors.HEADER)
-    print("=" * 50 + "\n")
-
-
-def get_valid_directory(prompt, allow_default=False, default_dir=None):
-    """获取有效的目录路径"""
-    while True:
-        dir_path = input(prompt).strip()
-
-        # 处理默认目录情况
-        if allow_default and not dir_path:
-            if default_dir and os.path.isdir(default_dir):
-                return default_dir
-            else:
-                print_colored("默认目录不存在，请输入有效的目录路径", Colors.WARNING)
-                continue
-
-        # 检查目录是否存在
-        if os.path.isdir(dir_path):
-            return os.path.abspath(dir_path)
-        else:
-            print_colored(f"错误：目录 '{dir_path}' 不存在，请重新输入", Colors.FAIL)
-
-
-def csv_to_excel(csv_file_path, output_dir):
-    """将CSV文件转换为Excel文件"""
-    try:
-        # 获取文件名（不含扩展名）
-        file_name = os.path.splitext(os.path.basename(csv_file_path))[0]
-        excel_file_path = os.path.join(output_dir, f"{file_name}.xlsx")
-
-        # 创建备份
-        if os.path.exists(excel_file_path):
-            shutil.copy2(excel_file_path, f"{excel_file_path}.bak")
-            print_colored(f"已创建备份文件: {excel_file_path}.bak", Colors.WARNING)
-
-        # 创建一个新的Excel工作簿
-        wb = Workbook()
-        ws = wb.active
-
-        # 读取CSV文件并写入Excel
-        with open(csv_file_path, 'r', encoding='utf-8', newline='') as csvfile:
-            csv_reader = csv.reader(csvfile)
-            for row_idx, row in enumerate(csv_reader, 1):
-                for col_idx, value in enumerate(row, 1):
-                    ws.cell(row=row_idx, column=col_idx, value=value)
-
-        # 保存Excel文件
-        wb.save(excel_file_path)
-        print_colored(f"已将CSV文件转换为Excel: {excel_file_path}", Colors.OKGREEN)
-        return excel_file_path
-
-    except Exception as e:
-        print_colored(f"转换CSV文件 {csv_file_path} 时出错: {str(e)}", Colors.FAIL)
-        return None
-
-
-def beautify_excel(file_path, output_dir):
-    """美化Excel文件的函数"""
-    try:
-        # 加载工作簿
-        wb = load_workbook(file_path)
-
-        # 定义样式
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-        normal_font = Font(size=11)
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        center_alignment = Alignment(horizontal="center", vertical="center")
-        left_alignment = Alignment(horizontal="left", vertical="center")
-
-        # 处理每个工作表
-        for sheet in wb.worksheets:
-            # 如果工作表有数据
-            if sheet.max_row > 0:
-                # 设置标题行样式（第一行）
-                for col in range(1, sheet.max_column + 1):
-                    cell = sheet.cell(row=1, column=col)
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = center_alignment
-                    cell.border = thin_border
-
-            # 调整列宽
-            for col in range(1, sheet.max_column + 1):
-                max_length = 0
-                column_letter = get_column_letter(col)
-
-                # 检查每一行的内容长度
-                for row in range(1, sheet.max_row + 1):
-                    cell = sheet[f"{column_letter}{row}"]
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-
-                # 设置列宽（加一点缓冲）
-                adjusted_width = (max_length + 2) * 1.2
-                sheet.column_dimensions[column_letter].width = adjusted_width
-
-            # 设置数据单元格样式
-            for row in range(2, sheet.max_row + 1):
-                for col in range(1, sheet.max_column + 1):
-                    cell = sheet.cell(row=row, column=col)
-                    cell.font = normal_font
-                    cell.border = thin_border
-
-                    # 尝试判断单元格内容类型设置对齐方式
-                    if cell.value is not None:
-                        if isinstance(cell.value, (int, float)):
-                            cell.alignment = center_alignment
-                        else:
-                            cell.alignment = left_alignment
-
-        # 确定输出文件路径（覆盖原文件）
-        output_file_path = os.path.join(output_dir, os.path.basename(file_path))
-
-        # 创建备份
-        if os.path.exists(output_file_path):
-            shutil.copy2(output_file_path, f"{output_file_path}.bak")
-            print_colored(f"已创建备份文件: {output_file_path}.bak", Colors.WARNING)
-
-        # 保存美化后的文件
-        wb.save(output_file_path)
-        print_colored(f"已成功美化并保存至: {output_file_path}", Colors.OKGREEN)
-        return True
-
-    except Exception as e:
-        print_colored(f"处理文件 {file_path} 时出错: {str(e)}", Colors.FAIL)
-        return False
-
-
-def select_files(file_list):
-    """让用户通过序号选择文件，支持多个选择用英文逗号分隔，默认选择全部"""
-    if not file_list:
-        return []
-
-    # 显示可选文件列表标题
-    print_colored("\n可选文件列表：", Colors.OKGREEN + Colors.BRIGHT)
-    # 显示序号和文件名
-    for i, file_path in enumerate(file_list, 1):
-        print_colored(f"{i}. {os.path.basename(file_path)}", Colors.PURPLE)
-
-    # 获取用户选择
-    while True:
-        selection = input("\n请输入要处理的文件序号（多个用英文逗号分隔，直接回车选择全部）: ").strip()
-
-        # 如果用户直接回车，默认选择全部文件
-        if not selection:
-            print_colored(f"已选择所有 {len(file_list)} 个文件进行处理", Colors.OKGREEN)
-            return file_list
-
-        try:
-            # 解析选择的序号
-            indices = [int(idx.strip()) - 1 for idx in selection.split(',')]
-            # 验证序号有效性
-            valid_indices = []
-            for idx in indices:
-                if 0 <= idx < len(file_list):
-                    valid_indices.append(idx)
-                else:
-                    print_colored(f"警告：序号 {idx + 1} 无效，已忽略", Colors.WARNING)
-
-            if not valid_indices:
-                print_colored("没有有效的文件序号，请重新输入", Colors.WARNING)
-                continue
-
-            # 返回选中的文件
-            selected_files = [file_list[idx] for idx in valid_indices]
-            print_colored(f"\n已选择 {len(selected_files)} 个文件进行处理", Colors.OKGREEN)
-            return selected_files
-
-        except ValueError:
-            print_colored("输入格式错误，请使用数字和英文逗号，如: 1,3,5", Colors.FAIL)
-
-
-def process_files(source_dir, output_dir):
-    """处理指定目录下的所有CSV和Excel文件"""
-    # 获取所有CSV和Excel文件
-    csv_files = glob.glob(os.path.join(source_dir, "*.csv"))
-    excel_files = glob.glob(os.path.join(source_dir, "*.xlsx")) + glob.glob(os.path.join(source_dir, "*.xls"))
-
-    all_files = csv_files + excel_files
-
-    if not all_files:
-        print_colored(f"在 {source_dir} 中没有找到Excel或CSV文件需要处理", Colors.WARNING)
-        return
-
-    # 让用户选择要处理的文件
-    print_header("文件选择")
-    print_colored(f"共发现 {len(csv_files)} 个CSV文件和 {len(excel_files)} 个Excel文件", Colors.OKBLUE)
-    selected_files = select_files(all_files)
-
-    if not selected_files:
-        print_colored("未选择任何文件，处理终止", Colors.WARNING)
-        return
-
-    # 分离CSV和Excel文件
-    selected_csv = [f for f in selected_files if f.lower().endswith('.csv')]
-    selected_excel = [f for f in selected_files if f.lower().endswith(('.xlsx', '.xls'))]
-
-    # 先处理CSV文件，转换为Excel
-    if selected_csv:
-        print_header("处理CSV文件")
-        print_colored(f"开始处理 {len(selected_csv)} 个CSV文件...", Colors.OKBLUE)
-        for csv_file in selected_csv:
-            csv_to_excel(csv_file, output_dir)
-
-    # 处理所有Excel文件
-    if selected_excel:
-        print_header("处理Excel文件")
-        print_colored(f"开始美化 {len(selected_excel)} 个Excel文件...", Colors.OKBLUE)
-        for file in selected_excel:
-            beautify_excel(file, output_dir)
-
-    print_header("处理完成")
-    print_colored("所有选中的文件处理完毕", Colors.OKGREEN)
-
-
-def check_and_install_libraries():
-    """检查并安装所需库"""
-    required_libraries = ['openpyxl', 'colorama']
-    for lib in required_libraries:
-        try:
-            __import__(lib)
-        except ImportError:
-            print_colored(f"检测到未安装{lib}库，正在尝试安装...", Colors.WARNING)
-            os.system(f"pip install {lib}")
-
-
-if __name__ == "__main__":
-    try:
-        # 打印程序标题艺术
-        print_colored_art()
-
-        # 打印工具标题
-        print_header("Excel/CSV 美化工具")
-
-        # 检查并安装所需库
-        check_and_install_libraries()
-
-        # 获取源目录
-        current_dir = os.getcwd()
-        source_dir = get_valid_directory(
-            f"{Colors.OKBLUE}请输入需要处理文件的目录: {Colors.ENDC}",
-            allow_default=True,
-            default_dir=current_dir
-        )
-
-        # 获取输出目录，默认使用源目录
-        output_dir = get_valid_directory(
-            f"{Colors.OKBLUE}请输入美化后文件的保存目录: {Colors.ENDC}",
-            allow_default=True,
-            default_dir=source_dir
-        )
-
-        # 处理文件
-        process_files(source_dir, output_dir)
-        input(f"\n{Colors.OKBLUE}按回车键退出...{Colors.ENDC}")
-
-    except Exception as e:
-        print_colored(f"发生错误: {e}", Colors.FAIL)
-        sys.exit(1)
+import sys
+import os
+import io
+import argparse
+import glob
+import csv
+import gzip
+import bz2
+import lzma
+import shutil
+import datetime
+import decimal
+import mmap
+import re
+import hashlib
+import struct
+import json
+import zipfile
+import functools
+import copy
+import time
+import socket
+import signal
+import asyncio
+import contextlib
+import tempfile
+import threading
+import queue
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+# resource 模块仅在类Unix系统可用，用于限制子进程内存
+try:
+    import resource
+except ImportError:
+    resource = None
+from array import array
+from collections import deque
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from colorama import init, Fore, Back, Style
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell, MergedCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.packaging.custom import StringProperty
+from openpyxl.reader.excel import ExcelReader
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.named_styles import NamedStyleList
+from openpyxl.styles.numbers import BUILTIN_FORMATS_MAX_SIZE
+from openpyxl.styles.stylesheet import apply_stylesheet, write_stylesheet
+from openpyxl.utils.exceptions import IllegalCharacterError
+from openpyxl.utils.indexed_list import IndexedList
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+from openpyxl.utils import get_column_letter, column_index_from_string, range_boundaries
+from openpyxl.worksheet._reader import WorkSheetParser
+from openpyxl.xml.constants import ARC_CUSTOM, ARC_STYLE, CPROPS_TYPE
+from openpyxl.xml.functions import tostring
+from ExcelBeautifierClient import DEFAULT_SERVER_PORT, send_to_server
+
+__version__ = "1.1.0"
+
+# 初始化colorama，支持Windows系统
+init(autoreset=True)
+
+# 支持的CSV扩展名（压缩文件在读取时边读边解压，不落地到磁盘）
+COMPRESSED_CSV_EXTENSIONS = ('.csv.gz', '.csv.bz2', '.csv.xz', '.csv.zst')
+CSV_EXTENSIONS = ('.csv',) + COMPRESSED_CSV_EXTENSIONS
+
+# 支持的列式文件扩展名（需要pyarrow库）
+COLUMNAR_EXTENSIONS = ('.parquet', '.arrow', '.feather')
+
+# 写入输出文件的自定义文档属性，用于识别已美化过的工作簿
+STAMP_VERSION = 'ExcelBeautifier.Version'
+STAMP_STYLE_HASH = 'ExcelBeautifier.StyleHash'
+STAMP_SOURCE = 'ExcelBeautifier.Source'
+STAMP_INCREMENTAL = 'ExcelBeautifier.Incremental'
+
+# 字符串存储策略：inline 为openpyxl默认的内联字符串，shared 全部使用共享字符串表，
+# adaptive 按列抽样，重复率高的列使用共享字符串
+STRING_STORAGE_STRATEGIES = ('inline', 'shared', 'adaptive')
+ADAPTIVE_SAMPLE_ROWS = 1000
+ADAPTIVE_SHARED_RATIO = 0.5
+# 读取CSV时按列驻留重复值，前 INTERN_SAMPLE_ROWS 行中不同值占比超过 INTERN_MAX_DISTINCT_RATIO 的列停止驻留
+INTERN_SAMPLE_ROWS = 1000
+INTERN_MAX_DISTINCT_RATIO = 0.5
+SHARED_STRINGS_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml'
+SHARED_STRINGS_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings'
+INLINE_STRING_PATTERN = re.compile(
+    rb'<c r="([A-Z]+)(\d+)"([^>]*?) t="inlineStr"><is><t(?: xml:space="preserve")?>(.*?)</t></is></c>', re.S)
+
+# 按工作表并行美化时流式改写工作表XML所用的模式
+WORKSHEET_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet'
+CUSTOM_PROPERTIES_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/custom-properties'
+SHEET_ROW_PATTERN = re.compile(rb'<row\b([^>]*?)(?:/>|>(.*?)</row>)', re.S)
+SHEET_CELL_PATTERN = re.compile(rb'<c\b([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+SHEET_COLS_PATTERN = re.compile(rb'<cols>(.*?)</cols>|<cols/>', re.S)
+SHEET_COL_PATTERN = re.compile(rb'<col\b([^>]*?)/>')
+DIMENSION_TAG_PATTERN = re.compile(rb'<dimension\b[^>]*/>')
+XML_ATTRIBUTE_PATTERN = re.compile(rb'([\w:]+)="([^"]*)"')
+CELL_REFERENCE_PATTERN = re.compile(rb'([A-Z]+)(\d+)')
+
+# 字典编码转换时由 openpyxl 写出不含数据的工作表框架，再填入直接生成的 sheetData
+EMPTY_SHEET_DATA_PATTERN = re.compile(rb'<sheetData\s*/>|<sheetData>\s*</sheetData>')
+ENCODED_SHEET_PART = 'xl/worksheets/sheet1.xml'
+
+# 常驻美化服务返回的xlsx内容类型
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# 各请求路径接受的 Content-Type，都不是浏览器可以跨域直接提交的简单类型
+SERVER_CONTENT_TYPES = {
+    '/process': ('application/json',),
+    '/beautify': (XLSX_CONTENT_TYPE, 'application/octet-stream'),
+    '/convert': ('text/csv', 'application/octet-stream'),
+}
+# /process 请求允许传入的处理选项及其类型，其余选项（如会写入任意路径的表结构缓存）一律拒绝
+SERVER_PROCESS_OPTIONS = {
+    'force': bool,
+    'incremental': bool,
+    'compact': bool,
+    'preserve': bool,
+    'encode': bool,
+    'string_storage': str,
+    'sheets': list,
+}
+
+# 批处理进度日志文件名（位于输出目录）
+JOURNAL_FILE_NAME = '.excel_beautifier_journal.jsonl'
+
+# 超时或超出内存上限的源文件会被移动到输出目录下的隔离目录
+QUARANTINE_DIR_NAME = 'quarantine'
+
+# 预检使用的文件头魔数
+ZIP_MAGIC = b'PK\x03\x04'
+OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+COMPRESSION_MAGIC = {
+    '.gz': b'\x1f\x8b',
+    '.bz2': b'BZh',
+    '.xz': b'\xfd7zXZ\x00',
+    '.zst': b'\x28\xb5\x2f\xfd',
+}
+XLSX_REQUIRED_PARTS = ('[Content_Types].xml', '_rels/.rels', 'xl/workbook.xml')
+PREFLIGHT_SAMPLE_SIZE = 64 * 1024
+
+# 运行计划的成本模型（在参考机器上用 csv_to_excel / beautify_excel 实测的每单元格开销）
+PLAN_COSTS = {
+    'csv': {'seconds': 21e-6, 'memory': 360, 'output': 6},
+    'excel': {'seconds': 60e-6, 'memory': 500, 'output': 6},
+    'columnar': {'seconds': 25e-6, 'memory': 0, 'output': 6},
+}
+PLAN_BASE_MEMORY = 40 * 1024 * 1024
+PLAN_BATCH_MEMORY = 64 * 1024 * 1024
+PLAN_SAMPLE_SIZE = 1024 * 1024
+PLAN_COMPRESSION_RATIO = 5
+PLAN_XLS_BYTES_PER_CELL = 12
+PLAN_SHEET_XML_BYTES_PER_CELL = 40
+DIMENSION_PATTERN = re.compile(rb'<dimension ref="([A-Z]+\d+(?::[A-Z]+\d+)?)"')
+
+# 工作表名称的限制：最长31个字符，不能包含 [ ] : * ? / \
+SHEET_TITLE_MAX_LENGTH = 31
+INVALID_SHEET_TITLE_PATTERN = re.compile(r'[\[\]:*?/\\]')
+
+# 并行解析CSV时每个分块的目标大小（解析后的行列表约为原文的十倍，同时在途的分块不超过进程数加一）
+PARALLEL_CHUNK_SIZE = 8 * 1024 * 1024
+
+# 可安全转换为数字的文本（整数部分不超过15位，前导零和科学计数法如 12E5 这类编码保留为文本）
+NUMBER_PATTERN = re.compile(r'-?(0|[1-9]\d{0,14})(\.\d+)?')
+# Excel 只保留15位有效数字
+NUMBER_MAX_DIGITS = 15
+
+
+# 颜色代码定义（结合colorama和ANSI转义码）
+class Colors:
+    # 使用ANSI转义码代替可能不支持的Style属性
+    HEADER = Fore.MAGENTA + Style.BRIGHT
+    OKBLUE = Fore.BLUE
+    OKGREEN = Fore.GREEN
+    WARNING = Fore.YELLOW
+    FAIL = Fore.RED
+    ENDC = Style.RESET_ALL
+    BRIGHT = Style.BRIGHT
+    # 使用ANSI转义码实现下划线效果
+    UNDERLINE = '\033[4m'
+    PURPLE = Fore.MAGENTA
+
+
+def print_colored_art():
+    """打印彩色ASCII艺术和作者信息"""
+    # 定义ASCII艺术图案
+    ascii_art = [
+        " _____              _ ____                   _   _  __ _           ",
+        "| ____|_  _____ ___| | __ )  ___  __ _ _   _| |_(_)/ _(_) ___ _ __  ",
+        "|  _| \\ \\/ / __/ _ \\ |  _ \\ / _ \\/ _` | | | | __| | |_| |/ _ \\ '__| ",
+        "| |___ >  < (_|  __/ | |_) |  __/ (_| | |_| | |_| |  _| |  __/ |    ",
+        "|_____/_/\\_\\___\\___|_|____/ \\___|\\__,_|\\__,_|\\__|_|_| |_|\\___|_|    "
+    ]
+
+    # 定义作者信息
+    author_info = [
+        "Author: Bifish",
+        "Github: https://github.com/Bifish0"
+    ]
+
+    # 计算最长行的长度
+    max_length = max(len(line) for line in ascii_art + author_info)
+
+    # 打印顶部装饰线
+    print(Fore.CYAN + "=" * (max_length + 4))
+
+    # 打印ASCII艺术，使用绿色
+    for line in ascii_art:
+        padded_line = line.ljust(max_length)
+        print(Fore.GREEN + f"| {padded_line} |")
+
+    # 打印分隔线
+    print(Fore.CYAN + "|" + "-" * (max_length + 2) + "|")
+
+    # 打印作者信息，使用黄色
+    for info in author_info:
+        padded_info = info.center(max_length)
+        print(Fore.YELLOW + f"| {padded_info} |")
+
+    # 打印底部装饰线
+    print(Fore.CYAN + "=" * (max_length + 4))
+
+    # 重置颜色
+    print(Style.RESET_ALL)
+
+
+# 流水线等多线程场景下保证每条输出完整成行
+_print_lock = threading.Lock()
+
+
+def print_colored(text, color):
+    """带颜色打印文本"""
+    with _print_lock:
+        print(f"{color}{text}{Colors.ENDC}")
+
+
+def print_header(text):
+    """打印标题样式文本"""
+    print("\n" + "=" * 50)
+    print_colored(f"{text:^50}", Colors.HEADER)
+    print("=" * 50 + "\n")
+
+
+def get_valid_directory(prompt, allow_default=False, default_dir=None):
+    """获取有效的目录路径"""
+    while True:
+        dir_path = input(prompt).strip()
+
+        # 处理默认目录情况
+        if allow_default and not dir_path:
+            if default_dir and os.path.isdir(default_dir):
+                return default_dir
+            else:
+                print_colored("默认目录不存在，请输入有效的目录路径", Colors.WARNING)
+                continue
+
+        # 检查目录是否存在
+        if os.path.isdir(dir_path):
+            return os.path.abspath(dir_path)
+        else:
+            print_colored(f"错误：目录 '{dir_path}' 不存在，请重新输入", Colors.FAIL)
+
+
+def create_styles():
+    """创建美化所用的样式集合"""
+    return {
+        'header_font': Font(bold=True, color="FFFFFF", size=12),
+        'header_fill': PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid"),
+        'normal_font': Font(size=11),
+        'thin_border': Border(
+            left=Side(style='thin'),
+            right=Side(style='thin'),
+            top=Side(style='thin'),
+            bottom=Side(style='thin')
+        ),
+        'center_alignment': Alignment(horizontal="center", vertical="center"),
+        'left_alignment': Alignment(horizontal="left", vertical="center"),
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def style_config_hash():
+    """计算当前样式配置的哈希，样式调整后旧的输出会被重新美化"""
+    styles = create_styles()
+    text = repr(sorted((name, repr(style)) for name, style in styles.items()))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def file_sha1(file_path):
+    """分块计算文件内容的 SHA1"""
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def file_fingerprint(file_path):
+    """计算源文件指纹（大小:修改时间(纳秒):SHA1），文件状态在读取内容之前获取"""
+    stat = os.stat(file_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}:{file_sha1(file_path)}"
+
+
+def read_source_file(file_path):
+    """读取源文件的全部字节并计算指纹，只读一遍文件，返回 (内容, 指纹)"""
+    stat = os.stat(file_path)
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    return data, f"{stat.st_size}:{stat.st_mtime_ns}:{hashlib.sha1(data).hexdigest()}"
+
+
+def fingerprint_matches(source_path, fingerprint):
+    """判断源文件是否与美化标记中的指纹一致
+
+    大小不同直接判为不一致，大小和修改时间都相同时判为一致，都不需要读取文件；
+    只有修改时间不同（如被复制或 touch 过）时才计算 SHA1 比较内容。旧版标记（大小:SHA1）总是比较内容。
+    """
+    parts = (fingerprint or '').split(':')
+    stat = os.stat(source_path)
+    if len(parts) not in (2, 3) or parts[0] != str(stat.st_size):
+        return False
+    if len(parts) == 3 and parts[1] == str(stat.st_mtime_ns):
+        return True
+    return parts[-1] == file_sha1(source_path)
+
+
+def stamp_workbook(wb, source_fingerprint):
+    """在工作簿中写入美化标记：工具版本、样式哈希和源文件指纹"""
+    stamp = {
+        STAMP_VERSION: __version__,
+        STAMP_STYLE_HASH: style_config_hash(),
+        STAMP_SOURCE: source_fingerprint,
+    }
+    for name, value in stamp.items():
+        if name in wb.custom_doc_props.names:
+            del wb.custom_doc_props[name]
+        wb.custom_doc_props.append(StringProperty(name=name, value=value))
+
+
+def read_incremental_state(wb):
+    """读取工作簿中记录的各工作表美化进度"""
+    if STAMP_INCREMENTAL not in wb.custom_doc_props.names:
+        return {}
+    try:
+        return json.loads(wb.custom_doc_props[STAMP_INCREMENTAL].value)
+    except (TypeError, ValueError):
+        return {}
+
+
+def write_incremental_state(wb, states):
+    """把各工作表已美化到的行和列内容长度写入自定义文档属性"""
+    if STAMP_INCREMENTAL in wb.custom_doc_props.names:
+        del wb.custom_doc_props[STAMP_INCREMENTAL]
+    wb.custom_doc_props.append(StringProperty(name=STAMP_INCREMENTAL,
+                                              value=json.dumps(states, ensure_ascii=False)))
+
+
+def read_beautify_stamp(file_path):
+    """只读取zip中的docProps/custom.xml获取美化标记，不加载整个工作簿"""
+    try:
+        with zipfile.ZipFile(file_path) as zf:
+            root = ElementTree.fromstring(zf.read('docProps/custom.xml'))
+    except (KeyError, OSError, zipfile.BadZipFile, ElementTree.ParseError):
+        return {}
+
+    stamp = {}
+    for prop in root:
+        name = prop.get('name')
+        if name in (STAMP_VERSION, STAMP_STYLE_HASH, STAMP_SOURCE) and len(prop):
+            stamp[name] = prop[0].text
+    return stamp
+
+
+def is_already_beautified(file_path, source_path=None):
+    """判断文件是否已由当前版本和样式美化过
+
+    指定 source_path 时，还要求标记中的源文件指纹与该源文件一致。
+    """
+    stamp = read_beautify_stamp(file_path)
+    if stamp.get(STAMP_VERSION) != __version__ or stamp.get(STAMP_STYLE_HASH) != style_config_hash():
+        return False
+    if source_path is not None:
+        return fingerprint_matches(source_path, stamp.get(STAMP_SOURCE))
+    return True
+
+
+def backup_existing(file_path):
+    """文件已存在时复制一份 .bak 备份"""
+    if os.path.exists(file_path):
+        shutil.copy2(file_path, f"{file_path}.bak")
+        print_colored(f"已创建备份文件: {file_path}.bak", Colors.WARNING)
+
+
+def column_width(max_length):
+    """按列中最长内容的字符数计算列宽（加一点缓冲）"""
+    return (max_length + 2) * 1.2
+
+
+def with_empty_cell_lengths(lengths, has_empty):
+    """beautify_worksheet 把数据范围内的空单元格按 str(None) 计算长度，直接生成输出的转换函数用它保持一致的列宽
+
+    has_empty 为各列在数据范围内是否有空单元格。
+    """
+    return [max(length, len(str(None))) if empty else length for length, empty in zip(lengths, has_empty)]
+
+
+def is_csv_file(file_path):
+    """判断文件是否为CSV或压缩的CSV"""
+    return file_path.lower().endswith(CSV_EXTENSIONS)
+
+
+def csv_base_name(csv_file_path):
+    """获取CSV文件名（去掉.csv及压缩扩展名）"""
+    file_name = os.path.basename(csv_file_path)
+    for ext in COMPRESSED_CSV_EXTENSIONS + ('.csv',):
+        if file_name.lower().endswith(ext):
+            return file_name[:-len(ext)]
+    return os.path.splitext(file_name)[0]
+
+
+def output_file_name(file_path):
+    """源文件对应的输出文件名：CSV、列式和xls文件转换为同名的.xlsx，xlsx文件保持原名"""
+    if is_csv_file(file_path):
+        return f"{csv_base_name(file_path)}.xlsx"
+    if file_path.lower().endswith('.xlsx'):
+        return os.path.basename(file_path)
+    return f"{os.path.splitext(os.path.basename(file_path))[0]}.xlsx"
+
+
+def open_csv_file(csv_file_path):
+    """以文本流方式打开CSV文件，压缩文件增量解压后直接交给CSV读取器"""
+    lower_path = csv_file_path.lower()
+    if lower_path.endswith('.gz'):
+        return gzip.open(csv_file_path, 'rt', encoding='utf-8', newline='')
+    if lower_path.endswith('.bz2'):
+        return bz2.open(csv_file_path, 'rt', encoding='utf-8', newline='')
+    if lower_path.endswith('.xz'):
+        return lzma.open(csv_file_path, 'rt', encoding='utf-8', newline='')
+    if lower_path.endswith('.zst'):
+        # zstd不在标准库中，按需导入
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("读取.zst文件需要zstandard库，请先执行: pip install zstandard")
+        raw_file = open(csv_file_path, 'rb')
+        reader = zstandard.ZstdDecompressor().stream_reader(raw_file, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8', newline='')
+    return open(csv_file_path, 'r', encoding='utf-8', newline='')
+
+
+def write_csv_rows(ws, csvfile):
+    """将CSV文本流逐行写入工作表
+
+    空字段写为 None，与保存后重新加载的结果一致，内存中直接美化时列宽和对齐才与落盘后美化相同。
+    每列的重复值只保留一个字符串对象；前 INTERN_SAMPLE_ROWS 行中不同值占比超过
+    INTERN_MAX_DISTINCT_RATIO 的高基数列停止驻留，避免驻留字典白白占用内存。
+    """
+    csv_reader = csv.reader(csvfile)
+    interned = []
+    for row_idx, row in enumerate(csv_reader, 1):
+        for col_idx, value in enumerate(row):
+            if col_idx == len(interned):
+                interned.append({})
+            if value == '':
+                value = None
+            elif interned[col_idx] is not None:
+                value = interned[col_idx].setdefault(value, value)
+            ws.cell(row=row_idx, column=col_idx + 1, value=value)
+        if row_idx == INTERN_SAMPLE_ROWS:
+            interned = [table if table is not None and len(table) <= row_idx * INTERN_MAX_DISTINCT_RATIO else None
+                        for table in interned]
+
+
+def get_used_range(sheet):
+    """根据有内容的单元格获取实际数据范围 (最大行, 最大列)
+
+    其他工具导出的文件常因零散格式把 max_row 撑到 1048576，这里只统计有值的单元格。
+    """
+    max_row = max_col = 0
+    for (row, col), cell in sheet._cells.items():
+        if cell.value is not None and cell.value != '':
+            if row > max_row:
+                max_row = row
+            if col > max_col:
+                max_col = col
+    return max_row, max_col
+
+
+def trim_worksheet(sheet, max_row, max_col):
+    """删除实际数据范围之外仅带格式的空单元格（合并单元格除外）"""
+    for key in [key for key, cell in sheet._cells.items()
+                if (key[0] > max_row or key[1] > max_col) and not isinstance(cell, MergedCell)]:
+        del sheet._cells[key]
+
+
+def column_type_name(kinds):
+    """把一列中出现过的类型集合归纳为 number/text/empty/mixed"""
+    if len(kinds) > 1:
+        return 'mixed'
+    return next(iter(kinds), 'empty')
+
+
+class SchemaProfileCache:
+    """按标题行哈希缓存的列宽和列类型配置
+
+    每天导出的文件往往只有几十种固定的表结构（标题行相同），命中缓存的工作表直接使用缓存的列宽，
+    跳过逐单元格的列宽扫描。缓存保存为JSON文件，保存时与文件中的现有内容合并，多个进程可共用。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.profiles = self._read()
+        self._updated = {}
+        self.hits = 0
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def key(header):
+        """标题行的哈希"""
+        text = json.dumps(['' if value is None else str(value) for value in header], ensure_ascii=False)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def get(self, header):
+        """返回标题行对应的配置 {'lengths': 各列最大内容长度, 'types': 各列类型}，没有时返回 None"""
+        profile = self.profiles.get(self.key(header))
+        if profile is None or len(profile['lengths']) != len(header):
+            return None
+        self.hits += 1
+        return profile
+
+    def put(self, header, profile):
+        key = self.key(header)
+        self.profiles[key] = profile
+        self._updated[key] = profile
+
+    def save(self):
+        """把新增或更新的配置合并写入缓存文件（先写临时文件再原子改名）"""
+        if not self._updated:
+            return
+        profiles = self._read()
+        profiles.update(self._updated)
+        # 缓存可能由多台主机共用，临时文件名不能只靠进程号区分
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(self.path)}.", suffix='.tmp',
+                                        dir=os.path.dirname(os.path.abspath(self.path)))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(profiles, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._updated = {}
+
+
+def beautify_worksheet(sheet, styles, state=None, profile_cache=None, refresh=False):
+    """美化单个工作表：标题行样式、列宽和数据单元格样式
+
+    只处理实际数据范围，尾部的空行空列会被裁掉。state 为上次美化的记录
+    {'row': 已美化到的行, 'lengths': 各列最大内容长度} 时，若只是追加了行，则只处理新增行。
+    profile_cache 为 SchemaProfileCache 时，标题行已知的工作表直接使用缓存的列宽和列类型
+    （数据单元格按列类型对齐），refresh 为 True 时仍检查每个单元格，内容更长时加宽并更新缓存。
+    返回本次美化后的记录。
+    """
+    max_row, max_col = get_used_range(sheet)
+    trim_worksheet(sheet, max_row, max_col)
+
+    # 增量模式：列数未变且只追加了行时，从上次美化到的行之后开始
+    if state and state['row'] <= max_row and len(state['lengths']) == max_col:
+        first_row = state['row'] + 1
+        lengths = list(state['lengths'])
+    else:
+        first_row = 1
+        lengths = [0] * max_col
+
+    # 如果工作表有数据
+    if max_row > 0 and first_row == 1:
+        # 设置标题行样式（第一行）
+        for col in range(1, max_col + 1):
+            cell = sheet.cell(row=1, column=col)
+            cell.font = styles['header_font']
+            cell.fill = styles['header_fill']
+            cell.alignment = styles['center_alignment']
+            cell.border = styles['thin_border']
+
+    # 表结构缓存：标题行已知时直接使用缓存的列宽，跳过逐单元格扫描
+    header = profile = None
+    if profile_cache is not None and max_row > 0 and first_row == 1:
+        header = [sheet.cell(row=1, column=col).value for col in range(1, max_col + 1)]
+        profile = profile_cache.get(header)
+
+    if profile is not None:
+        lengths = list(profile['lengths'])
+        for col, max_length in enumerate(lengths, 1):
+            sheet.column_dimensions[get_column_letter(col)].width = column_width(max_length)
+    else:
+        # 调整列宽
+        for col in range(1, max_col + 1):
+            max_length = lengths[col - 1]
+            column_letter = get_column_letter(col)
+
+            # 检查每一行的内容长度
+            for row in range(first_row, max_row + 1):
+                cell = sheet[f"{column_letter}{row}"]
+                try:
+                    if len(str(cell.value)) > max_length:
+                        max_length = len(str(cell.value))
+                except:
+                    pass
+
+            # 设置列宽（加一点缓冲），增量模式下只在新内容更长时加宽
+            if first_row == 1 or max_length > lengths[col - 1]:
+                adjusted_width = column_width(max_length)
+                sheet.column_dimensions[column_letter].width = adjusted_width
+            lengths[col - 1] = max_length
+
+    # 缓存命中且不刷新时按缓存的列类型对齐；需要写入缓存时统计各列出现的类型
+    column_types = profile['types'] if profile is not None and not refresh else None
+    kinds = None
+    if header is not None:
+        kinds = [set() if profile is None else
+                 {'number', 'text'} if column_type == 'mixed' else
+                 set() if column_type == 'empty' else {column_type}
+                 for column_type in (profile['types'] if profile is not None else [None] * max_col)]
+    widened = set()
+
+    # 设置数据单元格样式
+    for row in range(max(first_row, 2), max_row + 1):
+        for col in range(1, max_col + 1):
+            cell = sheet.cell(row=row, column=col)
+            cell.font = styles['normal_font']
+            cell.border = styles['thin_border']
+
+            # 刷新缓存时检查内容是否超出缓存的列宽
+            if refresh and profile is not None and len(str(cell.value)) > lengths[col - 1]:
+                lengths[col - 1] = len(str(cell.value))
+                widened.add(col)
+
+            # 尝试判断单元格内容类型设置对齐方式
+            if cell.value is not None:
+                column_type = column_types[col - 1] if column_types else None
+                if column_type not in ('number', 'text'):
+                    column_type = 'number' if isinstance(cell.value, (int, float)) else 'text'
+                if kinds is not None:
+                    kinds[col - 1].add(column_type)
+                if column_type == 'number':
+                    cell.alignment = styles['center_alignment']
+                else:
+                    cell.alignment = styles['left_alignment']
+
+    for col in widened:
+        sheet.column_dimensions[get_column_letter(col)].width = column_width(lengths[col - 1])
+    if header is not None and (profile is None or refresh):
+        profile_cache.put(header, {
+            'lengths': lengths,
+            'types': [column_type_name(k) for k in kinds],
+        })
+
+    return {'row': max_row, 'lengths': lengths}
+
+
+def beautify_workbook(wb, incremental=False, profile_cache=None, refresh_profiles=False):
+    """美化工作簿中的所有工作表
+
+    美化记录保存在工作簿的自定义文档属性中；incremental 为 True 时按记录只处理新增行。
+    profile_cache 和 refresh_profiles 见 beautify_worksheet。
+    """
+    styles = create_styles()
+    previous = read_incremental_state(wb) if incremental else {}
+    states = {}
+    for sheet in wb.worksheets:
+        states[sheet.title] = beautify_worksheet(sheet, styles, previous.get(sheet.title),
+                                                 profile_cache=profile_cache, refresh=refresh_profiles)
+    write_incremental_state(wb, states)
+    return states
+
+
+def compact_styles(wb):
+    """精简样式表：合并重复的字体、填充、边框和单元格格式，删除未使用的命名样式
+
+    单元格引用的样式索引会被重新映射。返回精简前后各样式表的条目数。
+    """
+    # 收集所有带样式的对象（单元格、行、列）
+    styled = []
+    for sheet in wb.worksheets:
+        styled.extend(cell for cell in sheet._cells.values() if cell._style is not None)
+        styled.extend(dim for dim in sheet.row_dimensions.values() if dim._style is not None)
+        styled.extend(dim for dim in sheet.column_dimensions.values() if dim._style is not None)
+
+    used = {tuple(obj._style) for obj in styled}
+    before = {
+        'xfs': len(wb._cell_styles) + len([t for t in used if StyleArray(t) not in wb._cell_styles]),
+        'fonts': len(wb._fonts),
+        'fills': len(wb._fills),
+        'borders': len(wb._borders),
+        'named_styles': len(wb._named_styles),
+    }
+
+    # 默认条目必须保留在最前面（Excel要求填充表前两项为none和gray125）
+    fonts = IndexedList(wb._fonts[:1])
+    fills = IndexedList(wb._fills[:2])
+    borders = IndexedList(wb._borders[:1])
+    alignments = IndexedList(wb._alignments[:1])
+    protections = IndexedList(wb._protections[:1])
+    number_formats = IndexedList()
+
+    # 只保留被引用的命名样式，"Normal"始终保留
+    used_xf_ids = {t[8] for t in used} | {0}
+    kept_named = [(idx, ns) for idx, ns in enumerate(wb._named_styles) if idx in used_xf_ids]
+    xf_id_map = {old: new for new, (old, _) in enumerate(kept_named)}
+
+    remapped = {}
+    for old in used:
+        style = StyleArray(old)
+        style.fontId = fonts.add(wb._fonts[style.fontId])
+        style.fillId = fills.add(wb._fills[style.fillId])
+        style.borderId = borders.add(wb._borders[style.borderId])
+        style.alignmentId = alignments.add(wb._alignments[style.alignmentId])
+        style.protectionId = protections.add(wb._protections[style.protectionId])
+        if style.numFmtId >= BUILTIN_FORMATS_MAX_SIZE:
+            code = wb._number_formats[style.numFmtId - BUILTIN_FORMATS_MAX_SIZE]
+            style.numFmtId = number_formats.add(code) + BUILTIN_FORMATS_MAX_SIZE
+        style.xfId = xf_id_map.get(style.xfId, 0)
+        remapped[old] = style
+
+    wb._fonts = fonts
+    wb._fills = fills
+    wb._borders = borders
+    wb._alignments = alignments
+    wb._protections = protections
+    wb._number_formats = number_formats
+
+    # 命名样式重新编号并绑定到新的样式表
+    wb._named_styles = NamedStyleList([ns for _, ns in kept_named])
+    for ns in wb._named_styles:
+        ns.bind(wb)
+
+    # 第0项为没有单独样式的单元格所用的默认格式，必须保留
+    wb._cell_styles = IndexedList([StyleArray()])
+    for obj in styled:
+        obj._style = copy.copy(remapped[tuple(obj._style)])
+        wb._cell_styles.add(obj._style)
+
+    after = {
+        'xfs': len(wb._cell_styles),
+        'fonts': len(wb._fonts),
+        'fills': len(wb._fills),
+        'borders': len(wb._borders),
+        'named_styles': len(wb._named_styles),
+    }
+    return before, after
+
+
+def measure_saved_workbook(file_path):
+    """返回已保存工作簿的 (文件大小, 加载时间)"""
+    load_start = time.perf_counter()
+    load_workbook(file_path)
+    return os.path.getsize(file_path), time.perf_counter() - load_start
+
+
+def measure_unsaved_workbook(wb, shared_columns):
+    """把工作簿按给定的字符串策略保存到临时文件，返回 (文件大小, 加载时间)"""
+    fd, tmp_path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        wb.save(tmp_path)
+        apply_string_storage(tmp_path, shared_columns)
+        return measure_saved_workbook(tmp_path)
+    finally:
+        os.remove(tmp_path)
+
+
+def choose_shared_columns(wb, strategy, sample_rows=ADAPTIVE_SAMPLE_ROWS):
+    """按字符串存储策略决定各工作表中使用共享字符串的列
+
+    返回 {工作表序号(从1开始): 列字母集合}。adaptive 策略对每列抽样前 sample_rows 行，
+    不同值占比不超过 ADAPTIVE_SHARED_RATIO 的列使用共享字符串，高基数列保持内联。
+    """
+    shared_columns = {}
+    if strategy == 'inline':
+        return shared_columns
+
+    for idx, sheet in enumerate(wb.worksheets, 1):
+        shared_columns[idx] = sample_shared_columns(
+            sheet.iter_rows(max_row=min(sample_rows, sheet.max_row), values_only=True),
+            sheet.max_column, strategy)
+    return shared_columns
+
+
+def sample_shared_columns(rows, max_col, strategy):
+    """由抽样行按字符串存储策略决定使用共享字符串的列字母集合，max_col 为工作表的列数"""
+    if strategy == 'inline':
+        return set()
+    if strategy == 'shared':
+        return {get_column_letter(col) for col in range(1, max_col + 1)}
+
+    samples = [[] for _ in range(max_col)]
+    for row in rows:
+        for col, value in enumerate(row):
+            if isinstance(value, str) and value:
+                samples[col].append(value)
+    return {
+        get_column_letter(col) for col, values in enumerate(samples, 1)
+        if values and len(set(values)) <= len(values) * ADAPTIVE_SHARED_RATIO
+    }
+
+
+def rewrite_sheet_strings(src, dst, shared_columns, table, counter):
+    """流式改写工作表XML，把指定列的内联字符串替换为共享字符串索引"""
+    def replace(match):
+        if match.group(1).decode() not in shared_columns:
+            return match.group(0)
+        counter[0] += 1
+        index = table.setdefault(match.group(4), len(table))
+        return b'<c r="%s%s"%s t="s"><v>%d</v></c>' % (match.group(1), match.group(2), match.group(3), index)
+
+    # 按 </row> 切分数据块，保证单元格不会被截断
+    tail = b''
+    for block in iter(lambda: src.read(1024 * 1024), b''):
+        data = tail + block
+        cut = data.rfind(b'</row>')
+        if cut == -1:
+            tail = data
+            continue
+        cut += len(b'</row>')
+        dst.write(INLINE_STRING_PATTERN.sub(replace, data[:cut]))
+        tail = data[cut:]
+    dst.write(INLINE_STRING_PATTERN.sub(replace, tail))
+
+
+def shared_strings_registration(archive):
+    """返回登记 xl/sharedStrings.xml 后的 [Content_Types].xml 和工作簿关系部件内容"""
+    return {
+        '[Content_Types].xml': archive.read('[Content_Types].xml').replace(
+            b'</Types>',
+            b'<Override PartName="/xl/sharedStrings.xml" ContentType="%s"/></Types>'
+            % SHARED_STRINGS_CONTENT_TYPE.encode()),
+        'xl/_rels/workbook.xml.rels': archive.read('xl/_rels/workbook.xml.rels').replace(
+            b'</Relationships>',
+            b'<Relationship Id="rIdSharedStrings" Type="%s" Target="sharedStrings.xml"/>'
+            b'</Relationships>' % SHARED_STRINGS_REL_TYPE.encode()),
+    }
+
+
+def apply_string_storage(xlsx_path, shared_columns):
+    """对已保存的xlsx应用共享字符串策略：改写工作表并生成 xl/sharedStrings.xml"""
+    if not any(shared_columns.values()):
+        return
+
+    tmp_path = f"{xlsx_path}.tmp"
+    table = {}
+    counter = [0]
+    with zipfile.ZipFile(xlsx_path) as zin:
+        if 'xl/sharedStrings.xml' in zin.namelist():
+            return
+        registration = shared_strings_registration(zin)
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zout:
+            for info in zin.infolist():
+                match = re.fullmatch(r'xl/worksheets/sheet(\d+)\.xml', info.filename)
+                if match and shared_columns.get(int(match.group(1))):
+                    with zin.open(info) as src, zout.open(info.filename, 'w', force_zip64=True) as dst:
+                        rewrite_sheet_strings(src, dst, shared_columns[int(match.group(1))], table, counter)
+                elif info.filename in registration:
+                    zout.writestr(info, registration[info.filename])
+                else:
+                    zout.writestr(info, zin.read(info))
+
+            with zout.open('xl/sharedStrings.xml', 'w', force_zip64=True) as sst:
+                sst.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                          b'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                          b'count="%d" uniqueCount="%d">' % (counter[0], len(table)))
+                for text in table:
+                    sst.write(b'<si><t xml:space="preserve">%s</t></si>' % text)
+                sst.write(b'</sst>')
+
+    os.replace(tmp_path, xlsx_path)
+
+
+def csv_to_excel(csv_file_path, output_dir, string_storage='inline'):
+    """将CSV文件转换为Excel文件
+
+    string_storage 为字符串存储策略（inline/shared/adaptive），见 choose_shared_columns。
+    """
+    try:
+        # 获取文件名（不含扩展名）
+        file_name = csv_base_name(csv_file_path)
+        excel_file_path = os.path.join(output_dir, f"{file_name}.xlsx")
+
+        # 创建备份
+        backup_existing(excel_file_path)
+
+        # 创建一个新的Excel工作簿
+        wb = Workbook()
+        ws = wb.active
+
+        # 读取CSV文件并写入Excel
+        with open_csv_file(csv_file_path) as csvfile:
+            write_csv_rows(ws, csvfile)
+
+        # 保存Excel文件
+        shared_columns = choose_shared_columns(wb, string_storage)
+        wb.save(excel_file_path)
+        apply_string_storage(excel_file_path, shared_columns)
+        print_colored(f"已将CSV文件转换为Excel: {excel_file_path}", Colors.OKGREEN)
+        return excel_file_path
+
+    except MemoryError:
+        # 内存不足交给调用方处理（受限子进程据此隔离文件）
+        raise
+    except Exception as e:
+        print_colored(f"转换CSV文件 {csv_file_path} 时出错: {str(e)}", Colors.FAIL)
+        return None
+
+
+def skip_beautified(file_path, output_file_path):
+    """源文件已美化过，或输出文件已由同一源文件美化过时打印提示并返回 True"""
+    if is_already_beautified(file_path):
+        print_colored(f"文件已美化过，跳过: {file_path}", Colors.OKBLUE)
+        return True
+    if (os.path.abspath(output_file_path) != os.path.abspath(file_path)
+            and os.path.exists(output_file_path)
+            and is_already_beautified(output_file_path, source_path=file_path)):
+        print_colored(f"输出文件已是最新，跳过: {output_file_path}", Colors.OKBLUE)
+        return True
+    return False
+
+
+def beautify_excel(file_path, output_dir, force=False, incremental=False, compact=False,
+                   string_storage='inline', profile_cache=None, refresh_profiles=False, final_dir=None):
+    """美化Excel文件的函数
+
+    已带有当前美化标记的文件（或输出文件已由同一源文件美化过）会被直接跳过，force 为 True 时强制重新美化。
+    incremental 为 True 时用于只追加行的工作簿：只美化上次之后新增的行，没有新增行时不重新保存。
+    compact 为 True 时保存前精简样式表，并报告精简前后文件大小和加载时间的变化
+    （未精简的美化结果会先保存到临时文件，两份文件各加载一次用于计时）。
+    string_storage 为字符串存储策略（inline/shared/adaptive），见 choose_shared_columns。
+    profile_cache 为表结构缓存文件路径，标题行已知的工作表跳过列宽扫描；refresh_profiles 为 True 时
+    内容超出缓存列宽会加宽并更新缓存。
+    输出先写入暂存目录时，final_dir 为最终的输出目录，用于判断输出是否已是最新。
+    """
+    try:
+        # 确定输出文件路径（覆盖原文件）
+        output_file_path = os.path.join(output_dir, os.path.basename(file_path))
+
+        # 跳过已美化过的文件，只读取文档属性，无需加载工作簿（增量模式需要检查新增行，不在此跳过）
+        if (not force and not incremental
+                and skip_beautified(file_path, os.path.join(final_dir or output_dir, os.path.basename(file_path)))):
+            return True
+
+        # 加载工作簿：源文件只读一遍，指纹直接对读入的内容计算
+        data, source_fingerprint = read_source_file(file_path)
+        wb = load_workbook(io.BytesIO(data))
+        del data
+
+        # 处理每个工作表
+        previous = read_incremental_state(wb)
+        cache = SchemaProfileCache(profile_cache) if profile_cache else None
+        states = beautify_workbook(wb, incremental=incremental and not force, profile_cache=cache,
+                                   refresh_profiles=refresh_profiles)
+        if cache is not None:
+            cache.save()
+            if cache.hits:
+                print_colored(f"表结构缓存命中 {cache.hits} 个工作表，已跳过列宽扫描", Colors.OKBLUE)
+        if (incremental and not force and states == previous
+                and os.path.abspath(output_file_path) == os.path.abspath(file_path)):
+            print_colored(f"没有新增行，跳过: {file_path}", Colors.OKBLUE)
+            return True
+        stamp_workbook(wb, source_fingerprint)
+        shared_columns = choose_shared_columns(wb, string_storage)
+
+        # 精简样式表，先保存一份未精简的美化结果作为对比基准
+        if compact:
+            baseline_size, baseline_load_time = measure_unsaved_workbook(wb, shared_columns)
+            before, after = compact_styles(wb)
+
+        # 创建备份
+        backup_existing(output_file_path)
+
+        # 保存美化后的文件
+        wb.save(output_file_path)
+        apply_string_storage(output_file_path, shared_columns)
+        print_colored(f"已成功美化并保存至: {output_file_path}", Colors.OKGREEN)
+
+        if compact:
+            output_size, output_load_time = measure_saved_workbook(output_file_path)
+            print_colored("样式表精简: " + "，".join(
+                f"{name} {before[name]} → {after[name]}" for name in before), Colors.OKBLUE)
+            print_colored(f"文件大小 {baseline_size / 1024:.1f} KB → {output_size / 1024:.1f} KB，"
+                          f"加载时间 {baseline_load_time:.3f}s → {output_load_time:.3f}s", Colors.OKBLUE)
+        return True
+
+    except MemoryError:
+        raise
+    except Exception as e:
+        print_colored(f"处理文件 {file_path} 时出错: {str(e)}", Colors.FAIL)
+        return False
+
+
+def stream_csv_to_excel(input_stream=None, output_stream=None):
+    """从标准输入读取CSV，将美化后的Excel写入标准输出（管道模式）
+
+    不创建临时文件和备份，也不询问目录，适合 `psql ... | python ExcelBeautifier.py --stream > report.xlsx`。
+    """
+    # 二进制标准输出留给xlsx数据，提示信息全部改走标准错误
+    if output_stream is None:
+        output_stream = sys.__stdout__.buffer
+        sys.stdout = sys.stderr
+    if input_stream is None:
+        input_stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+
+    try:
+        wb = Workbook()
+        # 边读边写，生产者与转换过程重叠进行
+        write_csv_rows(wb.active, input_stream)
+        beautify_workbook(wb)
+        stamp_workbook(wb, 'stdin')
+        wb.save(output_stream)
+        output_stream.flush()
+        return True
+
+    except Exception as e:
+        print_colored(f"管道模式处理时出错: {str(e)}", Colors.FAIL)
+        return False
+
+
+def read_file_bytes(file_path):
+    """读取文件的全部字节（CSV压缩文件会被解压）"""
+    if is_csv_file(file_path) and file_path.lower().endswith(COMPRESSED_CSV_EXTENSIONS):
+        with open_csv_file(file_path) as f:
+            return f.read().encode('utf-8')
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+def write_file_bytes(file_path, data):
+    """先写临时文件再原子改名，避免留下写了一半的文件"""
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+def beautify_excel_bytes(data):
+    """在内存中美化xlsx数据，返回美化后的xlsx字节"""
+    wb = load_workbook(io.BytesIO(data))
+    beautify_workbook(wb)
+    stamp_workbook(wb, f"{len(data)}:{hashlib.sha1(data).hexdigest()}")
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def csv_bytes_to_excel(data):
+    """在内存中把CSV数据转换为美化后的xlsx字节"""
+    wb = Workbook()
+    write_csv_rows(wb.active, io.StringIO(data.decode('utf-8'), newline=''))
+    beautify_workbook(wb)
+    stamp_workbook(wb, f"{len(data)}:{hashlib.sha1(data).hexdigest()}")
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def csv_bytes_to_xlsx(data):
+    """在内存中把CSV数据转换为xlsx字节，结果与 csv_to_excel 相同（不美化）"""
+    wb = Workbook()
+    write_csv_rows(wb.active, io.StringIO(data.decode('utf-8'), newline=''))
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def xls_cell_value(cell, datemode):
+    """把xlrd读取的BIFF单元格转换为Excel可写入的原生类型"""
+    import xlrd
+
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+        return None
+    if cell.ctype == xlrd.XL_CELL_NUMBER:
+        return int(cell.value) if float(cell.value).is_integer() else cell.value
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        try:
+            return xlrd.xldate_as_datetime(cell.value, datemode)
+        except (ValueError, OverflowError, xlrd.xldate.XLDateError):
+            return cell.value
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(cell.value)
+    if cell.ctype == xlrd.XL_CELL_ERROR:
+        return xlrd.error_text_from_code.get(cell.value, '#ERR')
+    return cell.value
+
+
+def xls_to_excel(file_path, output_dir):
+    """将旧版xls（BIFF）文件逐表逐行读取，一次性写出美化后的xlsx文件"""
+    try:
+        try:
+            import xlrd
+        except ImportError:
+            raise ImportError("读取.xls文件需要xlrd库，请先执行: pip install xlrd")
+
+        file_name = os.path.splitext(os.path.basename(file_path))[0]
+        excel_file_path = os.path.join(output_dir, f"{file_name}.xlsx")
+
+        # on_demand 模式下工作表在用到时才解析，处理完即释放
+        book = xlrd.open_workbook(file_path, on_demand=True)
+
+        # 创建备份
+        backup_existing(excel_file_path)
+
+        styles = create_styles()
+        wb = Workbook(write_only=True)
+        states = {}
+        for sheet_index in range(book.nsheets):
+            sheet = book.sheet_by_index(sheet_index)
+            ws = wb.create_sheet(title=sheet.name)
+
+            # 只写模式需要先确定列宽，这里先扫描一遍计算各列最大长度和数据范围
+            lengths = [0] * sheet.ncols
+            first_empty_rows = [None] * sheet.ncols
+            max_row = 0
+            for row_idx in range(sheet.nrows):
+                values = [xls_cell_value(cell, book.datemode) for cell in sheet.row(row_idx)]
+                values += [None] * (sheet.ncols - len(values))
+                for col_idx, value in enumerate(values):
+                    if value is None:
+                        if first_empty_rows[col_idx] is None:
+                            first_empty_rows[col_idx] = row_idx + 1
+                        continue
+                    max_row = row_idx + 1
+                    lengths[col_idx] = max(lengths[col_idx], len(str(value)))
+            lengths = with_empty_cell_lengths(lengths, [first is not None and first <= max_row
+                                                        for first in first_empty_rows])
+            for col, max_length in enumerate(lengths, 1):
+                ws.column_dimensions[get_column_letter(col)].width = column_width(max_length)
+
+            # 逐行写入带样式的单元格，第一行为标题行
+            for row_idx in range(sheet.nrows):
+                values = [xls_cell_value(cell, book.datemode) for cell in sheet.row(row_idx)]
+                values += [None] * (sheet.ncols - len(values))
+                ws.append([styled_cell(ws, value, styles, is_header=row_idx == 0) for value in values])
+
+            states[ws.title] = {'row': sheet.nrows, 'lengths': lengths}
+            book.unload_sheet(sheet_index)
+
+        if not states:
+            wb.create_sheet()
+        write_incremental_state(wb, states)
+        stamp_workbook(wb, file_fingerprint(file_path))
+        wb.save(excel_file_path)
+        book.release_resources()
+        print_colored(f"已将xls文件转换并美化为: {excel_file_path}", Colors.OKGREEN)
+        return excel_file_path
+
+    except MemoryError:
+        raise
+    except Exception as e:
+        print_colored(f"转换xls文件 {file_path} 时出错: {str(e)}", Colors.FAIL)
+        return None
+
+
+def convert_csv_value(value):
+    """将CSV文本转换为数字，无法原样保存的（超过15位有效数字、负零）保持文本"""
+    match = NUMBER_PATTERN.fullmatch(value)
+    if not match:
+        return value
+    integer, fraction = match.groups()
+    if fraction is None:
+        number = int(value)
+    else:
+        digits = (integer if integer != '0' else '') + fraction[1:]
+        if len(digits.lstrip('0')) > NUMBER_MAX_DIGITS:
+            return value
+        number = float(value)
+    if number == 0 and value.startswith('-'):
+        return value
+    return number
+
+
+def find_csv_chunk_bounds(mm, chunk_size=PARALLEL_CHUNK_SIZE):
+    """在内存映射的CSV中寻找安全的行边界，返回 (起始, 结束) 字节区间列表
+
+    通过引号计数的奇偶性判断换行符是否位于带引号的字段内，只在引号外的换行处切分。
+    """
+    size = len(mm)
+    bounds = []
+    start = 0
+    pos = 0
+    in_quotes = False
+    while start < size:
+        target = start + chunk_size
+        if target >= size:
+            bounds.append((start, size))
+            break
+
+        # 统计到目标位置为止的引号状态
+        in_quotes ^= mm[pos:target].count(b'"') % 2 == 1
+        pos = target
+
+        # 向后寻找第一个不在引号内的换行符
+        end = size
+        while True:
+            newline = mm.find(b'\n', pos)
+            if newline == -1:
+                break
+            in_quotes ^= mm[pos:newline].count(b'"') % 2 == 1
+            pos = newline + 1
+            if not in_quotes:
+                end = pos
+                break
+
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def parse_csv_chunk(task):
+    """在工作进程中解析CSV的一个分块并做类型转换"""
+    csv_file_path, start, end, convert_types = task
+    with open(csv_file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = mm[start:end].decode('utf-8')
+
+    rows = list(csv.reader(io.StringIO(text, newline='')))
+    if convert_types:
+        rows = [[convert_csv_value(value) for value in row] for row in rows]
+    return rows
+
+
+def parallel_csv_to_excel(csv_file_path, output_dir, workers=None, chunk_size=PARALLEL_CHUNK_SIZE,
+                          convert_types=True, string_storage='inline'):
+    """多进程并行解析大CSV文件并转换为Excel文件
+
+    文件以内存映射方式切分为若干分块，由多个进程解析，按顺序交给唯一的写入器写入工作簿。
+    同时在途（已解析未写入）的分块不超过 workers + 1 个。string_storage 见 choose_shared_columns，
+    adaptive 策略按前 ADAPTIVE_SAMPLE_ROWS 行抽样。
+    """
+    try:
+        file_name = csv_base_name(csv_file_path)
+        excel_file_path = os.path.join(output_dir, f"{file_name}.xlsx")
+        workers = workers or os.cpu_count() or 1
+
+        # 按引号安全的行边界切分文件（空文件无法映射）
+        with open(csv_file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                bounds = []
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    bounds = find_csv_chunk_bounds(mm, chunk_size)
+
+        # 创建备份
+        backup_existing(excel_file_path)
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+
+        sample = []
+        max_col = 0
+
+        def write_chunk(rows):
+            nonlocal max_col
+            if len(sample) < ADAPTIVE_SAMPLE_ROWS:
+                sample.extend(rows[:ADAPTIVE_SAMPLE_ROWS - len(sample)])
+            max_col = max(max_col, max(map(len, rows), default=0))
+            for row in rows:
+                ws.append(row)
+
+        # 限制同时在途的分块数量，写入器按提交顺序取结果
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for start, end in bounds:
+                pending.append(executor.submit(parse_csv_chunk, (csv_file_path, start, end, convert_types)))
+                if len(pending) > workers:
+                    write_chunk(pending.popleft().result())
+            while pending:
+                write_chunk(pending.popleft().result())
+
+        wb.save(excel_file_path)
+        apply_string_storage(excel_file_path, {1: sample_shared_columns(sample, max_col, string_storage)})
+        print_colored(f"已将CSV文件并行转换为Excel: {excel_file_path}", Colors.OKGREEN)
+        return excel_file_path
+
+    except MemoryError:
+        raise
+    except Exception as e:
+        print_colored(f"并行转换CSV文件 {csv_file_path} 时出错: {str(e)}", Colors.FAIL)
+        return None
+
+
+def styled_cell(ws, value, styles, is_header=False):
+    """为只写模式工作表创建已设置好样式的单元格"""
+    cell = WriteOnlyCell(ws, value=value)
+    cell.border = styles['thin_border']
+    if is_header:
+        cell.font = styles['header_font']
+        cell.fill = styles['header_fill']
+        cell.alignment = styles['center_alignment']
+    else:
+        cell.font = styles['normal_font']
+        if value is not None:
+            if isinstance(value, (int, float)):
+                cell.alignment = styles['center_alignment']
+            else:
+                cell.alignment = styles['left_alignment']
+    return cell
+
+
+def iter_record_batches(file_path, batch_size=65536):
+    """逐个读取Parquet/Arrow/Feather文件的记录批次，内存占用只与批次大小相关"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("读取列式文件需要pyarrow库，请先执行: pip install pyarrow")
+
+    if file_path.lower().endswith('.parquet'):
+        yield from pq.ParquetFile(file_path).iter_batches(batch_size=batch_size)
+        return
+
+    # Feather v2 即 Arrow IPC 文件格式，也兼容 IPC 流格式
+    with pa.memory_map(file_path, 'r') as source:
+        try:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+        except pa.ArrowInvalid:
+            source.seek(0)
+            yield from pa.ipc.open_stream(source)
+
+
+def arrow_column_lengths(batch):
+    """基于列式数组计算批次中每列内容的最大显示长度"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    lengths = []
+    for column in batch.columns:
+        if pa.types.is_temporal(column.type):
+            # 日期时间的字符串格式与Python不同，按写入Excel后读回的值计算（日期读回为 datetime），与 beautify_excel 一致
+            values = (to_excel_value(v) for v in column.to_pylist() if v is not None)
+            max_length = max((len(str(datetime.datetime.combine(v, datetime.time())
+                                      if type(v) is datetime.date else v)) for v in values), default=0)
+            lengths.append(max_length)
+            continue
+        try:
+            text = column if pa.types.is_string(column.type) else pc.cast(column, pa.string())
+            max_length = pc.max(pc.utf8_length(text)).as_py()
+        except (pa.ArrowNotImplementedError, pa.ArrowInvalid):
+            # 嵌套等无法直接转字符串的类型，退回逐个值计算
+            max_length = max((len(str(v)) for v in column.to_pylist() if v is not None), default=0)
+        lengths.append(max_length or 0)
+    return lengths
+
+
+def to_excel_value(value):
+    """将Arrow转换出的Python值转为Excel可写入的类型，数字和日期保持原生类型"""
+    if value is None or isinstance(value, (str, int, float, decimal.Decimal,
+                                           datetime.date, datetime.time)):
+        # Excel不支持带时区的时间
+        if isinstance(value, (datetime.datetime, datetime.time)) and value.tzinfo is not None:
+            return value.replace(tzinfo=None)
+        return value
+    if isinstance(value, datetime.timedelta):
+        return value
+    return str(value)
+
+
+def columnar_to_excel(file_path, output_dir, batch_size=65536):
+    """将Parquet/Arrow/Feather文件按记录批次转换为美化后的Excel文件"""
+    try:
+        file_name = os.path.splitext(os.path.basename(file_path))[0]
+        excel_file_path = os.path.join(output_dir, f"{file_name}.xlsx")
+
+        # 第一遍：逐批次基于列式数组计算列宽，不保留数据
+        header = None
+        max_lengths = []
+        has_empty = []
+        for batch in iter_record_batches(file_path, batch_size):
+            if header is None:
+                header = batch.schema.names
+                max_lengths = [len(str(name)) for name in header]
+                has_empty = [False] * len(header)
+            for idx, length in enumerate(arrow_column_lengths(batch)):
+                max_lengths[idx] = max(max_lengths[idx], length)
+                has_empty[idx] = has_empty[idx] or batch.column(idx).null_count > 0
+        max_lengths = with_empty_cell_lengths(max_lengths, has_empty)
+
+        if header is None:
+            print_colored(f"文件 {file_path} 中没有数据，已跳过", Colors.WARNING)
+            return None
+
+        # 创建备份
+        backup_existing(excel_file_path)
+
+        # 第二遍：只写模式逐批次写入带样式的原生类型单元格
+        styles = create_styles()
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        for col, max_length in enumerate(max_lengths, 1):
+            ws.column_dimensions[get_column_letter(col)].width = column_width(max_length)
+
+        ws.append([styled_cell(ws, name, styles, is_header=True) for name in header])
+        row_count = 1
+        for batch in iter_record_batches(file_path, batch_size):
+            columns = [column.to_pylist() for column in batch.columns]
+            for values in zip(*columns):
+                ws.append([styled_cell(ws, to_excel_value(v), styles) for v in values])
+            row_count += batch.num_rows
+
+        write_incremental_state(wb, {ws.title: {'row': row_count, 'lengths': max_lengths}})
+        stamp_workbook(wb, file_fingerprint(file_path))
+        wb.save(excel_file_path)
+        print_colored(f"已将列式文件转换为Excel: {excel_file_path}", Colors.OKGREEN)
+        return excel_file_path
+
+    except MemoryError:
+        raise
+    except Exception as e:
+        print_colored(f"转换列式文件 {file_path} 时出错: {str(e)}", Colors.FAIL)
+        return None
+
+
+class DictionaryEncodedColumns:
+    """按列字典编码的CSV数据
+
+    每列保存去重后的取值列表和整数编码数组（编码0表示空字段），重复值只保留一个字符串对象。
+    列宽和基数直接从各列字典统计，无需逐个单元格计算。
+    """
+
+    def __init__(self):
+        self.values = []
+        self.codes = []
+        self._lookups = []
+        self.row_count = 0
+        self.max_row = 0
+        self.max_col = 0
+
+    def append(self, row):
+        """编码一行CSV字段"""
+        self.row_count += 1
+        for _ in range(len(self.codes), len(row)):
+            # 新出现的列在之前的行中都是空的
+            self.values.append([None])
+            self._lookups.append({})
+            self.codes.append(array('I', bytes(4 * (self.row_count - 1))))
+
+        has_data = False
+        for col, value in enumerate(row):
+            code = 0
+            if value != '':
+                lookup = self._lookups[col]
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(self.values[col])
+                    self.values[col].append(value)
+                has_data = True
+                self.max_col = max(self.max_col, col + 1)
+            self.codes[col].append(code)
+        for col in range(len(row), len(self.codes)):
+            self.codes[col].append(0)
+        if has_data:
+            self.max_row = self.row_count
+
+    def finish(self):
+        """编码结束：释放查找字典，裁掉实际数据范围之外的行和列"""
+        self._lookups = None
+        del self.values[self.max_col:], self.codes[self.max_col:]
+        for codes in self.codes:
+            del codes[self.max_row:]
+
+    def column_lengths(self):
+        """各列最大内容长度，与 beautify_worksheet 一致，空单元格按 str(None) 计算长度"""
+        return with_empty_cell_lengths([max(map(len, values[1:]), default=0) for values in self.values],
+                                       [0 in codes for codes in self.codes])
+
+    def column_types(self):
+        """各列数据行（不含标题行）的类型 number/text/empty/mixed，与表结构缓存一致，只检查用到的去重取值"""
+        types = []
+        for values, codes in zip(self.values, self.codes):
+            kinds = {'number' if isinstance(values[code], (int, float)) else 'text'
+                     for code in set(codes[1:]) if code}
+            types.append(column_type_name(kinds))
+        return types
+
+    def shared_columns(self, strategy):
+        """按字符串存储策略返回使用共享字符串的列字母集合，adaptive 直接使用各列的实际基数"""
+        if strategy == 'inline':
+            return set()
+        return {get_column_letter(col) for col, values in enumerate(self.values, 1)
+                if strategy == 'shared' or len(values) - 1 <= self.max_row * ADAPTIVE_SHARED_RATIO}
+
+
+def encoded_cell_xml(value, style_id, shared_index=None):
+    """生成单元格XML中 r 属性之后的部分，每个去重后的取值只生成一次"""
+    if value is None:
+        return b' s="%d"/>' % style_id
+    if isinstance(value, (int, float)):
+        return b' s="%d" t="n"><v>%s</v></c>' % (style_id, repr(value).encode())
+    if shared_index is not None:
+        return b' s="%d" t="s"><v>%d</v></c>' % (style_id, shared_index)
+    if ILLEGAL_CHARACTERS_RE.search(value):
+        raise IllegalCharacterError(f"{value!r} 包含不能写入工作表的字符")
+    space = b' xml:space="preserve"' if value != value.strip() else b''
+    return b' s="%d" t="inlineStr"><is><t%s>%s</t></is></c>' % (style_id, space, escape(value).encode('utf-8'))
+
+
+def write_encoded_sheet_data(dst, columns, style_ids, shared_letters, table):
+    """由各列字典直接写出 sheetData 中的各行
+
+    每列的单元格XML按编码预先生成，逐个单元格只需按编码取出拼接。shared_letters 中的列使用共享字符串，
+    每个去重后的取值只在 table（取值 → 序号）中查找一次。返回共享字符串单元格数。
+    """
+    letters = [get_column_letter(col).encode() for col in range(1, columns.max_col + 1)]
+    header_cells = []
+    data_cells = []
+    shared_count = 0
+    for letter, values, codes in zip(letters, columns.values, columns.codes):
+        shared = letter.decode() in shared_letters
+        indexes = [None] * len(values)
+        if shared:
+            for code, value in enumerate(values):
+                if code and isinstance(value, str):
+                    indexes[code] = table.setdefault(value, len(table))
+            shared_count += len(codes) - codes.count(0)
+        header_code = codes[0] if len(codes) else 0
+        header_cells.append(encoded_cell_xml(values[header_code], style_ids['header'], indexes[header_code]))
+        cells = []
+        for code, value in enumerate(values):
+            if value is None:
+                cells.append(encoded_cell_xml(None, style_ids['empty']))
+            else:
+                kind = 'number' if isinstance(value, (int, float)) else 'text'
+                cells.append(encoded_cell_xml(value, style_ids[kind], indexes[code]))
+        data_cells.append(cells)
+
+    for row in range(columns.max_row):
+        number = b'%d' % (row + 1)
+        parts = [b'<row r="%s">' % number]
+        if row == 0:
+            parts.extend(b'<c r="' + letter + number + b'"' + cell for letter, cell in zip(letters, header_cells))
+        else:
+            parts.extend(b'<c r="' + letter + number + b'"' + cells[codes[row]]
+                         for letter, cells, codes in zip(letters, data_cells, columns.codes))
+        parts.append(b'</row>')
+        dst.write(b''.join(parts))
+    return shared_count
+
+
+def encoded_csv_to_excel(csv_file_path, output_dir, string_storage='inline', profile_cache=None):
+    """以按列字典编码的方式读取CSV，一次读取即写出美化后的Excel文件
+
+    内存中只保留各列的去重取值和每个单元格4字节的编码。列宽、列类型和共享字符串的选择直接来自各列字典，
+    openpyxl 只写出不含数据的工作簿框架（列宽、样式表、文档属性），工作表数据和共享字符串表
+    由各列字典直接生成，不再逐个单元格创建对象，也不在保存后重新扫描改写。
+    profile_cache 为表结构缓存文件路径，给出时把各列长度和类型按标题行写入缓存，供之后美化同结构的文件使用。
+    """
+    try:
+        excel_file_path = os.path.join(output_dir, f"{csv_base_name(csv_file_path)}.xlsx")
+
+        columns = DictionaryEncodedColumns()
+        with open_csv_file(csv_file_path) as csvfile:
+            for row in csv.reader(csvfile):
+                columns.append(row)
+        columns.finish()
+        lengths = columns.column_lengths()
+        shared_letters = columns.shared_columns(string_storage)
+
+        # 创建备份
+        backup_existing(excel_file_path)
+
+        # 各角色的样式编号来自样板单元格，样式表仍由 openpyxl 写出
+        styles = create_styles()
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        for col, max_length in enumerate(lengths, 1):
+            ws.column_dimensions[get_column_letter(col)].width = column_width(max_length)
+        style_ids = {
+            'header': styled_cell(ws, '', styles, is_header=True).style_id,
+            'number': styled_cell(ws, 0, styles).style_id,
+            'text': styled_cell(ws, '', styles).style_id,
+            'empty': styled_cell(ws, None, styles).style_id,
+        }
+        write_incremental_state(wb, {ws.title: {'row': columns.max_row, 'lengths': lengths}})
+        stamp_workbook(wb, file_fingerprint(csv_file_path))
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            frame_path = os.path.join(work_dir, 'frame.xlsx')
+            sheet_path = os.path.join(work_dir, 'sheet1.xml')
+            wb.save(frame_path)
+            with zipfile.ZipFile(frame_path) as archive:
+                head, tail = EMPTY_SHEET_DATA_PATTERN.split(archive.read(ENCODED_SHEET_PART), 1)
+                replacements = shared_strings_registration(archive) if shared_letters else {}
+
+            table = {}
+            with open(sheet_path, 'wb') as dst:
+                dst.write(head + b'<sheetData>')
+                shared_count = write_encoded_sheet_data(dst, columns, style_ids, shared_letters, table)
+                dst.write(b'</sheetData>' + tail)
+            replacements[ENCODED_SHEET_PART] = sheet_path
+
+            if shared_letters:
+                sst_path = os.path.join(work_dir, 'sharedStrings.xml')
+                with open(sst_path, 'wb') as sst:
+                    sst.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                              b'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                              b'count="%d" uniqueCount="%d">' % (shared_count, len(table)))
+                    for text in table:
+                        sst.write(b'<si><t xml:space="preserve">%s</t></si>' % escape(text).encode('utf-8'))
+                    sst.write(b'</sst>')
+                replacements['xl/sharedStrings.xml'] = sst_path
+
+            write_workbook_parts(frame_path, excel_file_path, replacements)
+
+        if profile_cache and columns.max_row:
+            cache = SchemaProfileCache(profile_cache)
+            header = [values[codes[0]] for values, codes in zip(columns.values, columns.codes)]
+            cache.put(header, {'lengths': lengths, 'types': columns.column_types()})
+            cache.save()
+
+        print_colored(f"已将CSV文件转换并美化为: {excel_file_path}", Colors.OKGREEN)
+        return excel_file_path
+
+    except MemoryError:
+        raise
+    except Exception as e:
+        print_colored(f"转换CSV文件 {csv_file_path} 时出错: {str(e)}", Colors.FAIL)
+        return None
+
+
+def safe_sheet_title(name, used_titles):
+    """由文件名生成合法且不重复的工作表名称，used_titles 为已用名称的小写集合
+
+    名称不能以单引号开头或结尾，先截断再去掉首尾的单引号，加序号后缀时同样处理。
+    """
+    title = INVALID_SHEET_TITLE_PATTERN.sub('_', name)[:SHEET_TITLE_MAX_LENGTH].strip("'") or 'Sheet'
+    candidate = title
+    suffix_number = 2
+    # 名称不区分大小写，History 为 Excel 保留名称
+    while candidate.lower() in used_titles or candidate.lower() == 'history':
+        suffix = f"_{suffix_number}"
+        candidate = (title[:SHEET_TITLE_MAX_LENGTH - len(suffix)].strip("'") or 'Sheet') + suffix
+        suffix_number += 1
+    used_titles.add(candidate.lower())
+    return candidate
+
+
+def scan_csv_layout(csv_file_path):
+    """流式扫描CSV，返回实际数据范围 (最大行, 最大列) 和各列最大内容长度，不保留数据
+
+    与 beautify_worksheet 一致，数据范围内的空单元格按 str(None) 计算长度。
+    """
+    max_row = max_col = 0
+    lengths = []
+    first_empty_rows = []
+    with open_csv_file(csv_file_path) as csvfile:
+        for row_idx, row in enumerate(csv.reader(csvfile), 1):
+            if len(row) > len(lengths):
+                # 新出现的列在之前的行中都是空的
+                added = len(row) - len(lengths)
+                lengths += [0] * added
+                first_empty_rows += [1 if row_idx > 1 else None] * added
+            has_data = False
+            for col_idx, value in enumerate(row):
+                if value != '':
+                    has_data = True
+                    max_col = max(max_col, col_idx + 1)
+                    lengths[col_idx] = max(lengths[col_idx], len(value))
+                elif first_empty_rows[col_idx] is None:
+                    first_empty_rows[col_idx] = row_idx
+            for col_idx in range(len(row), len(lengths)):
+                if first_empty_rows[col_idx] is None:
+                    first_empty_rows[col_idx] = row_idx
+            if has_data:
+                max_row = row_idx
+
+    lengths = with_empty_cell_lengths(lengths[:max_col], [first is not None and first <= max_row
+                                                          for first in first_empty_rows[:max_col]])
+    return max_row, max_col, lengths
+
+
+def merge_csv_files(csv_files, excel_file_path):
+    """将多个CSV文件逐个流式写入同一个工作簿，每个CSV一个美化后的工作表
+
+    每个CSV读取两遍：第一遍计算数据范围和列宽，第二遍以只写模式写入带样式的单元格，
+    内存占用与工作表数量和文件大小无关。
+    """
+    try:
+        # 创建备份
+        backup_existing(excel_file_path)
+
+        styles = create_styles()
+        wb = Workbook(write_only=True)
+        used_titles = set()
+        states = {}
+        fingerprints = []
+        for csv_file_path in csv_files:
+            max_row, max_col, lengths = scan_csv_layout(csv_file_path)
+            ws = wb.create_sheet(title=safe_sheet_title(csv_base_name(csv_file_path), used_titles))
+            for col, max_length in enumerate(lengths, 1):
+                ws.column_dimensions[get_column_letter(col)].width = column_width(max_length)
+
+            with open_csv_file(csv_file_path) as csvfile:
+                for row_idx, row in enumerate(csv.reader(csvfile), 1):
+                    if row_idx > max_row:
+                        break
+                    values = [value if value != '' else None for value in row[:max_col]]
+                    values += [None] * (max_col - len(values))
+                    ws.append([styled_cell(ws, value, styles, is_header=row_idx == 1) for value in values])
+
+            states[ws.title] = {'row': max_row, 'lengths': lengths}
+            fingerprints.append(file_fingerprint(csv_file_path))
+            print_colored(f"已写入工作表 {ws.title}: {os.path.basename(csv_file_path)}", Colors.OKGREEN)
+
+        if not states:
+            wb.create_sheet()
+        write_incremental_state(wb, states)
+        stamp_workbook(wb, hashlib.sha1('|'.join(fingerprints).encode()).hexdigest())
+        wb.save(excel_file_path)
+        print_colored(f"已将 {len(states)} 个CSV文件合并为: {excel_file_path}", Colors.OKGREEN)
+        return excel_file_path
+
+    except MemoryError:
+        raise
+    except Exception as e:
+        print_colored(f"合并CSV文件到 {excel_file_path} 时出错: {str(e)}", Colors.FAIL)
+        return None
+
+
+def build_beautify_style_table(wb):
+    """在工作簿原有样式表的基础上预先生成美化后的单元格样式
+
+    beautify_worksheet 只替换字体、边框（标题行还有填充）和对齐，保留数字格式等其他属性，
+    因此每个原样式在四种角色下各对应一个新样式。返回列表，第 i 项为
+    {'header': 序号, 'number': 序号, 'text': 序号, 'empty': 序号}，分别对应标题、数字、文本和空单元格。
+    """
+    styles = create_styles()
+    header_font = wb._fonts.add(styles['header_font'])
+    normal_font = wb._fonts.add(styles['normal_font'])
+    header_fill = wb._fills.add(styles['header_fill'])
+    border = wb._borders.add(styles['thin_border'])
+    center = wb._alignments.add(styles['center_alignment'])
+    left = wb._alignments.add(styles['left_alignment'])
+    roles = {
+        'header': (header_font, header_fill, center),
+        'number': (normal_font, None, center),
+        'text': (normal_font, None, left),
+        'empty': (normal_font, None, None),
+    }
+
+    table = []
+    for style in list(wb._cell_styles):
+        entry = {}
+        for role, (font_id, fill_id, alignment_id) in roles.items():
+            new_style = copy.copy(style)
+            new_style.fontId = font_id
+            new_style.borderId = border
+            if fill_id is not None:
+                new_style.fillId = fill_id
+            if alignment_id is not None:
+                new_style.alignmentId = alignment_id
+            entry[role] = wb._cell_styles.add(new_style)
+        table.append(entry)
+    return table
+
+
+# 工作表子进程共用的只读数据（共享字符串、日期样式、预先生成的样式表），由进程池初始化时设置
+_sheet_worker_context = {}
+
+
+def init_sheet_worker(context):
+    """工作表子进程初始化"""
+    _sheet_worker_context.update(context)
+
+
+def scan_sheet_layout(src, context):
+    """流式解析工作表XML，返回实际数据范围 (最大行, 最大列) 和各列最大内容长度
+
+    单元格的值与 load_workbook 读取的一致，列宽计算规则与 beautify_worksheet 相同。
+    """
+    parser = WorkSheetParser(src, context['shared_strings'], epoch=context['epoch'],
+                             date_formats=context['date_formats'],
+                             timedelta_formats=context['timedelta_formats'])
+    max_row = max_col = 0
+    lengths = {}
+    counts = {}
+    for _, cells in parser.parse():
+        for cell in cells:
+            value = cell['value']
+            if value is None:
+                continue
+            col = cell['column']
+            counts[col] = counts.get(col, 0) + 1
+            lengths[col] = max(lengths.get(col, 0), len(str(value)))
+            if value != '':
+                max_row = max(max_row, cell['row'])
+                max_col = max(max_col, col)
+
+    columns = range(1, max_col + 1)
+    return max_row, max_col, with_empty_cell_lengths([lengths.get(col, 0) for col in columns],
+                                                     [counts.get(col, 0) < max_row for col in columns])
+
+
+def xml_attributes(attributes):
+    """把属性字典序列化为XML属性字节串"""
+    return b' '.join(b'%s="%s"' % (name, value) for name, value in attributes.items())
+
+
+def rewrite_sheet_head(head, max_row, max_col, lengths):
+    """改写 sheetData 之前的部分：更新 dimension，并按内容长度重建列宽"""
+    if not max_col:
+        return head
+    head = DIMENSION_TAG_PATTERN.sub(
+        b'<dimension ref="A1:%s%d"/>' % (get_column_letter(max_col).encode(), max_row), head, count=1)
+
+    match = SHEET_COLS_PATTERN.search(head)
+    existing = []
+    if match and match.group(1):
+        existing = [dict(XML_ATTRIBUTE_PATTERN.findall(col.group(1)))
+                    for col in SHEET_COL_PATTERN.finditer(match.group(1))]
+
+    # 数据范围内的列逐列设置宽度，保留原有的隐藏、样式等属性；范围外的列定义原样保留
+    entries = []
+    for col, max_length in enumerate(lengths, 1):
+        attributes = next((dict(a) for a in existing if int(a[b'min']) <= col <= int(a[b'max'])), {})
+        attributes.update({b'min': b'%d' % col, b'max': b'%d' % col,
+                           b'width': repr(column_width(max_length)).encode(), b'customWidth': b'1'})
+        entries.append(attributes)
+    for attributes in existing:
+        if int(attributes[b'max']) > max_col:
+            attributes[b'min'] = b'%d' % max(int(attributes[b'min']), max_col + 1)
+            entries.append(attributes)
+    cols = b'<cols>' + b''.join(b'<col %s/>' % xml_attributes(a) for a in entries) + b'</cols>'
+
+    if match:
+        return head[:match.start()] + cols + head[match.end():]
+    return head + cols
+
+
+def sheet_cell_role(attributes, body, style_id, date_styles):
+    """根据单元格XML判断美化角色，与 beautify_worksheet 按值类型设置对齐的规则一致"""
+    if body is None or (b'<v' not in body and b'<f' not in body and b'<is' not in body):
+        return 'empty'
+    if b'<f' in body:
+        return 'text'
+    data_type = attributes.get(b't', b'n')
+    if data_type == b'b' or (data_type == b'n' and style_id not in date_styles):
+        return 'number'
+    return 'text'
+
+
+def rewrite_sheet_styles(src, dst, max_row, max_col, lengths, context):
+    """流式改写工作表XML：替换单元格样式序号，补齐数据范围内缺失的单元格，丢弃范围外的行和单元格"""
+    table = context['style_table']
+    date_styles = context['date_formats'] | context['timedelta_formats']
+    letters = [get_column_letter(col).encode() for col in range(1, max_col + 1)]
+    state = {'next_row': 1, 'row_counter': 0}
+
+    def style_for(style_id, role):
+        return (table[style_id] if style_id < len(table) else table[0])[role]
+
+    def missing_cells(row, first_col, last_col):
+        style = style_for(0, 'header' if row == 1 else 'empty')
+        return b''.join(b'<c r="%s%d" s="%d"/>' % (letters[col - 1], row, style)
+                        for col in range(first_col, last_col + 1))
+
+    def missing_rows(last_row):
+        rows = b''.join(b'<row r="%d">%s</row>' % (row, missing_cells(row, 1, max_col))
+                        for row in range(state['next_row'], last_row + 1))
+        state['next_row'] = max(state['next_row'], last_row + 1)
+        return rows
+
+    def rewrite_row(match):
+        attributes = dict(XML_ATTRIBUTE_PATTERN.findall(match.group(1)))
+        row = int(attributes[b'r']) if b'r' in attributes else state['row_counter'] + 1
+        state['row_counter'] = row
+        if row > max_row:
+            return b''
+
+        output = [missing_rows(row - 1)]
+        col_counter = 0
+        cells = []
+        for cell in SHEET_CELL_PATTERN.finditer(match.group(2) or b''):
+            cell_attributes = dict(XML_ATTRIBUTE_PATTERN.findall(cell.group(1)))
+            reference = CELL_REFERENCE_PATTERN.fullmatch(cell_attributes.get(b'r', b''))
+            col = column_index_from_string(reference.group(1).decode()) if reference else col_counter + 1
+            if col > max_col:
+                continue
+            if col > col_counter + 1:
+                cells.append(missing_cells(row, col_counter + 1, col - 1))
+            col_counter = col
+
+            style_id = int(cell_attributes.get(b's', 0))
+            role = 'header' if row == 1 else sheet_cell_role(cell_attributes, cell.group(2), style_id, date_styles)
+            cell_attributes[b's'] = b'%d' % style_for(style_id, role)
+            body = cell.group(2)
+            cells.append(b'<c %s/>' % xml_attributes(cell_attributes) if body is None
+                         else b'<c %s>%s</c>' % (xml_attributes(cell_attributes), body))
+        if col_counter < max_col:
+            cells.append(missing_cells(row, col_counter + 1, max_col))
+
+        attributes.pop(b'spans', None)
+        attributes[b'r'] = b'%d' % row
+        output.append(b'<row %s>%s</row>' % (xml_attributes(attributes), b''.join(cells)))
+        state['next_row'] = row + 1
+        return b''.join(output)
+
+    def rewrite_rows(data):
+        return b''.join(rewrite_row(match) for match in SHEET_ROW_PATTERN.finditer(data))
+
+    # sheetData 之前的部分（维度、列宽）
+    head = b''
+    for block in iter(lambda: src.read(1024 * 1024), b''):
+        head += block
+        start = head.find(b'<sheetData')
+        if start != -1 and head.find(b'>', start) != -1:
+            break
+    else:
+        raise ValueError("工作表中没有找到 sheetData")
+    end = head.find(b'>', start) + 1
+    dst.write(rewrite_sheet_head(head[:start], max_row, max_col, lengths))
+    if head[end - 2:end] == b'/>':
+        dst.write(head[start:])
+        shutil.copyfileobj(src, dst)
+        return
+    dst.write(head[start:end])
+
+    # 按 </row> 切分数据块，保证行不会被截断；sheetData 之后的部分原样复制
+    data = head[end:]
+    while True:
+        close = data.find(b'</sheetData>')
+        if close != -1:
+            dst.write(rewrite_rows(data[:close]) + missing_rows(max_row) + data[close:])
+            shutil.copyfileobj(src, dst)
+            return
+        cut = data.rfind(b'</row>')
+        if cut != -1:
+            cut += len(b'</row>')
+            dst.write(rewrite_rows(data[:cut]))
+            data = data[cut:]
+        block = src.read(1024 * 1024)
+        if not block:
+            raise ValueError("工作表XML不完整")
+        data += block
+
+
+def beautify_sheet_part(file_path, part_name, output_path):
+    """在子进程中美化一个工作表部件，改写后的XML写入 output_path，返回该表的美化记录"""
+    context = _sheet_worker_context
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open(part_name) as src:
+            max_row, max_col, lengths = scan_sheet_layout(src, context)
+        with archive.open(part_name) as src, open(output_path, 'wb') as dst:
+            rewrite_sheet_styles(src, dst, max_row, max_col, lengths, context)
+    return {'row': max_row, 'lengths': lengths}
+
+
+def strip_zip64_extra(extra):
+    """去掉zip扩展字段中的 ZIP64 记录，写入本地文件头时会按需重新生成"""
+    stripped = b''
+    while len(extra) >= 4:
+        header_id, size = struct.unpack('<HH', extra[:4])
+        if header_id != 1:
+            stripped += extra[:4 + size]
+        extra = extra[4 + size:]
+    return stripped
+
+
+def copy_zip_member_raw(zin, zout, info):
+    """把zip成员的压缩数据原样复制到另一个zip中，不解压也不重新压缩"""
+    zin.fp.seek(info.header_offset)
+    header = zin.fp.read(zipfile.sizeFileHeader)
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    zin.fp.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+
+    # 大小和CRC已知，写在本地文件头中，不再使用数据描述符
+    new_info = copy.copy(info)
+    new_info.flag_bits &= ~0x08
+    new_info.extra = strip_zip64_extra(info.extra)
+    zout.fp.seek(zout.start_dir)
+    new_info.header_offset = zout.fp.tell()
+    zout.fp.write(new_info.FileHeader())
+    remaining = info.compress_size
+    while remaining:
+        block = zin.fp.read(min(remaining, 1024 * 1024))
+        if not block:
+            raise ValueError(f"zip成员 {info.filename} 数据不完整")
+        zout.fp.write(block)
+        remaining -= len(block)
+    zout.filelist.append(new_info)
+    zout.NameToInfo[new_info.filename] = new_info
+    zout.start_dir = zout.fp.tell()
+
+
+def write_workbook_parts(file_path, output_path, replacements):
+    """复制xlsx中的各个部件，replacements 中的部件（字节串或文件路径）替换原内容，不存在的部件追加到末尾
+
+    未改动的部件（图表、图片、数据透视缓存、VBA 等）按原压缩数据逐字节复制，不解压也不重新压缩。
+    """
+    def write_part(zout, target, replacement):
+        if isinstance(replacement, bytes):
+            zout.writestr(target, replacement)
+            return
+        name = target.filename if isinstance(target, zipfile.ZipInfo) else target
+        with open(replacement, 'rb') as src, zout.open(name, 'w', force_zip64=True) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+
+    with zipfile.ZipFile(file_path) as zin, \
+            zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zout:
+        names = set(zin.namelist())
+        for info in zin.infolist():
+            replacement = replacements.get(info.filename)
+            if replacement is None:
+                copy_zip_member_raw(zin, zout, info)
+            else:
+                write_part(zout, info, replacement)
+        for name, replacement in replacements.items():
+            if name not in names:
+                write_part(zout, name, replacement)
+
+
+def preserve_option_conflict(preserve, sheets, incremental=False, compact=False, string_storage='inline',
+                             profile_cache=None):
+    """--preserve/--sheets 与需经 openpyxl 重新保存整个工作簿的选项同时使用时返回错误说明，否则返回 None"""
+    if not preserve and not sheets:
+        return None
+    conflicts = [name for name, enabled in (('--incremental', incremental), ('--compact', compact),
+                                            ('--strings', string_storage != 'inline'),
+                                            ('--profile-cache', profile_cache)) if enabled]
+    if not conflicts:
+        return None
+    return (f"--preserve/--sheets 不能与 {', '.join(conflicts)} 一起使用："
+            f"这些选项会经 openpyxl 重新保存整个工作簿，无法只改写指定部件")
+
+
+def parallel_beautify_excel(file_path, output_dir, workers=None, force=False, sheets=None, preserve=False,
+                            final_dir=None):
+    """按工作表多进程美化一个工作簿
+
+    主进程只读取样式表、共享字符串和工作簿结构，预先生成美化后的样式表；各工作表的XML在
+    单独的进程中流式改写，最后与其余部件重新打包。结果与 beautify_excel 一致。
+    只改写工作表、样式表和文档属性部件，其余部件原样复制，openpyxl 无法保留的内容也不会丢失。
+    sheets 为要美化的工作表名称列表，未列出的工作表原样保留；workers 为1或只有一个工作表时在当前进程中处理。
+    不支持的文件（如带命名空间前缀的工作表XML）会改用 beautify_excel；preserve 为 True 或指定了 sheets 时
+    改用常规方式会美化所有工作表并丢失 openpyxl 无法保留的部件，因此直接返回 False。
+    final_dir 见 beautify_excel。
+    """
+    output_file_path = os.path.join(output_dir, os.path.basename(file_path))
+    try:
+        if not force and skip_beautified(file_path, os.path.join(final_dir or output_dir,
+                                                                 os.path.basename(file_path))):
+            return True
+
+        source_fingerprint = file_fingerprint(file_path)
+
+        # 只读取工作簿结构、共享字符串、样式表和自定义属性，不解析工作表
+        reader = ExcelReader(file_path)
+        reader.read_manifest()
+        reader.read_strings()
+        reader.read_workbook()
+        reader.read_custom()
+        if ARC_STYLE not in reader.valid_files:
+            raise ValueError("文件中没有样式表")
+        apply_stylesheet(reader.archive, reader.wb)
+        wb = reader.wb
+        worksheets = [(sheet.name, rel.target) for sheet, rel in reader.parser.find_sheets()
+                      if rel.Type == WORKSHEET_REL_TYPE]
+        selected = [(name, part) for name, part in worksheets if not sheets or name in sheets]
+        if not selected:
+            print_colored(f"文件 {file_path} 中没有指定的工作表，跳过", Colors.WARNING)
+            return True
+        previous = read_incremental_state(wb)
+        has_custom = ARC_CUSTOM in reader.valid_files
+        reader.archive.close()
+
+        context = {
+            'shared_strings': reader.shared_strings,
+            'epoch': wb.epoch,
+            'date_formats': wb._date_formats,
+            'timedelta_formats': wb._timedelta_formats,
+            'style_table': build_beautify_style_table(wb),
+        }
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            replacements = {part: os.path.join(work_dir, f"sheet{index}.xml")
+                            for index, (_, part) in enumerate(selected)}
+            if workers == 1 or len(selected) == 1:
+                init_sheet_worker(context)
+                states = {name: beautify_sheet_part(file_path, part, replacements[part]) for name, part in selected}
+            else:
+                # 每个工作表一个任务，工作表XML在子进程中读取和改写
+                with ProcessPoolExecutor(max_workers=workers, initializer=init_sheet_worker,
+                                         initargs=(context,)) as executor:
+                    futures = [(name, executor.submit(beautify_sheet_part, file_path, part, replacements[part]))
+                               for name, part in selected]
+                    states = {name: future.result() for name, future in futures}
+
+            # 只美化了部分工作表时不写入美化标记，之后仍可美化其余工作表
+            write_incremental_state(wb, dict(previous, **states))
+            if len(selected) == len(worksheets):
+                stamp_workbook(wb, source_fingerprint)
+            replacements[ARC_STYLE] = tostring(write_stylesheet(wb))
+            replacements[ARC_CUSTOM] = tostring(wb.custom_doc_props.to_tree())
+            if not has_custom:
+                with zipfile.ZipFile(file_path) as archive:
+                    replacements['[Content_Types].xml'] = archive.read('[Content_Types].xml').replace(
+                        b'</Types>', b'<Override PartName="/%s" ContentType="%s"/></Types>'
+                        % (ARC_CUSTOM.encode(), CPROPS_TYPE.encode()))
+                    replacements['_rels/.rels'] = archive.read('_rels/.rels').replace(
+                        b'</Relationships>',
+                        b'<Relationship Id="rIdCustomProperties" Type="%s" Target="%s"/></Relationships>'
+                        % (CUSTOM_PROPERTIES_REL_TYPE.encode(), ARC_CUSTOM.encode()))
+
+            tmp_path = f"{output_file_path}.tmp"
+            write_workbook_parts(file_path, tmp_path, replacements)
+
+        # 创建备份
+        backup_existing(output_file_path)
+        os.replace(tmp_path, output_file_path)
+        print_colored(f"已按工作表美化 {len(selected)}/{len(worksheets)} 个工作表并保存至: {output_file_path}",
+                      Colors.OKGREEN)
+        return True
+
+    except MemoryError:
+        raise
+    except Exception as e:
+        if os.path.exists(f"{output_file_path}.tmp"):
+            os.remove(f"{output_file_path}.tmp")
+        if preserve or sheets:
+            print_colored(f"按工作表美化 {file_path} 时出错: {str(e)}", Colors.FAIL)
+            return False
+        print_colored(f"按工作表并行美化 {file_path} 时出错: {str(e)}，改用常规方式", Colors.WARNING)
+        return beautify_excel(file_path, output_dir, force=force, final_dir=final_dir)
+
+
+def select_files(file_list):
+    """让用户通过序号选择文件，支持多个选择用英文逗号分隔，默认选择全部"""
+    if not file_list:
+        return []
+
+    # 显示可选文件列表标题
+    print_colored("\n可选文件列表：", Colors.OKGREEN + Colors.BRIGHT)
+    # 显示序号和文件名
+    for i, file_path in enumerate(file_list, 1):
+        print_colored(f"{i}. {os.path.basename(file_path)}", Colors.PURPLE)
+
+    # 获取用户选择
+    while True:
+        selection = input("\n请输入要处理的文件序号（多个用英文逗号分隔，直接回车选择全部）: ").strip()
+
+        # 如果用户直接回车，默认选择全部文件
+        if not selection:
+            print_colored(f"已选择所有 {len(file_list)} 个文件进行处理", Colors.OKGREEN)
+            return file_list
+
+        try:
+            # 解析选择的序号
+            indices = [int(idx.strip()) - 1 for idx in selection.split(',')]
+            # 验证序号有效性
+            valid_indices = []
+            for idx in indices:
+                if 0 <= idx < len(file_list):
+                    valid_indices.append(idx)
+                else:
+                    print_colored(f"警告：序号 {idx + 1} 无效，已忽略", Colors.WARNING)
+
+            if not valid_indices:
+                print_colored("没有有效的文件序号，请重新输入", Colors.WARNING)
+                continue
+
+            # 返回选中的文件
+            selected_files = [file_list[idx] for idx in valid_indices]
+            print_colored(f"\n已选择 {len(selected_files)} 个文件进行处理", Colors.OKGREEN)
+            return selected_files
+
+        except ValueError:
+            print_colored("输入格式错误，请使用数字和英文逗号，如: 1,3,5", Colors.FAIL)
+
+
+def discover_and_select_files(source_dir):
+    """查找目录下所有可处理的文件并让用户选择，返回选中的文件列表"""
+    # 获取所有CSV和Excel文件
+    csv_files = []
+    for ext in CSV_EXTENSIONS:
+        csv_files += glob.glob(os.path.join(source_dir, f"*{ext}"))
+    excel_files = glob.glob(os.path.join(source_dir, "*.xlsx")) + glob.glob(os.path.join(source_dir, "*.xls"))
+    columnar_files = []
+    for ext in COLUMNAR_EXTENSIONS:
+        columnar_files += glob.glob(os.path.join(source_dir, f"*{ext}"))
+
+    all_files = csv_files + excel_files + columnar_files
+
+    if not all_files:
+        print_colored(f"在 {source_dir} 中没有找到Excel或CSV文件需要处理", Colors.WARNING)
+        return []
+
+    # 让用户选择要处理的文件
+    print_header("文件选择")
+    print_colored(f"共发现 {len(csv_files)} 个CSV文件、{len(excel_files)} 个Excel文件和 "
+                  f"{len(columnar_files)} 个列式文件", Colors.OKBLUE)
+    selected_files = select_files(all_files)
+
+    if not selected_files:
+        print_colored("未选择任何文件，处理终止", Colors.WARNING)
+    return selected_files
+
+
+def preflight_check(file_path):
+    """快速预检文件，只读取文件头、zip中央目录或CSV开头，返回失败原因，通过时返回 None"""
+    try:
+        size = os.path.getsize(file_path)
+        if size == 0:
+            return "文件为空"
+        with open(file_path, 'rb') as f:
+            head = f.read(8)
+    except OSError as e:
+        return f"无法读取文件: {e.strerror}"
+
+    lower_path = file_path.lower()
+
+    if is_csv_file(file_path):
+        for ext, magic in COMPRESSION_MAGIC.items():
+            if lower_path.endswith(ext) and not head.startswith(magic):
+                return f"文件头与 {ext} 压缩格式不符"
+        if head.startswith(ZIP_MAGIC) or head.startswith(OLE_MAGIC):
+            return "扩展名为CSV，但内容是Excel文件"
+        try:
+            with open_csv_file(file_path) as f:
+                sample = f.read(PREFLIGHT_SAMPLE_SIZE)
+        except UnicodeDecodeError as e:
+            return f"不是有效的UTF-8编码（位置 {e.start}）"
+        except Exception as e:
+            # 各解压库的异常类型不同（gzip/bz2 为 OSError，lzma、zstandard 各有自己的异常）
+            return f"无法解压或读取: {str(e)}"
+        if '\x00' in sample:
+            return "包含二进制数据，不是文本CSV"
+        return None
+
+    if lower_path.endswith('.parquet'):
+        # 文件头尾各有4字节的PAR1标记
+        if size < 8:
+            return "不是有效的Parquet文件（文件过小）"
+        try:
+            with open(file_path, 'rb') as f:
+                f.seek(-4, os.SEEK_END)
+                tail = f.read(4)
+        except OSError as e:
+            return f"无法读取文件: {e.strerror}"
+        if not head.startswith(b'PAR1') or tail != b'PAR1':
+            return "不是有效的Parquet文件（缺少PAR1标记）"
+        return None
+
+    if lower_path.endswith(('.arrow', '.feather')):
+        if not head.startswith((b'ARROW1', b'FEA1', b'\xff\xff\xff\xff')):
+            return "不是有效的Arrow/Feather文件"
+        return None
+
+    # Excel文件
+    if head.startswith(OLE_MAGIC):
+        if lower_path.endswith('.xls'):
+            try:
+                import xlrd
+            except ImportError:
+                return "旧版xls（BIFF）格式需要xlrd库，请先执行: pip install xlrd"
+            return None
+        return "OLE复合文档：可能是加密的xlsx或被改名的xls"
+    if not head.startswith(ZIP_MAGIC):
+        return "不是zip格式，文件已损坏或不是Excel文件"
+    if lower_path.endswith('.xls'):
+        return "扩展名为.xls，但内容是xlsx格式，请改为.xlsx后再处理"
+    try:
+        with zipfile.ZipFile(file_path) as zf:
+            names = set(zf.namelist())
+    except (zipfile.BadZipFile, OSError, ValueError) as e:
+        return f"zip中央目录损坏: {str(e)}"
+    missing = [part for part in XLSX_REQUIRED_PARTS if part not in names]
+    if missing:
+        return f"缺少必需的部件: {', '.join(missing)}"
+    return None
+
+
+def preflight_files(file_list):
+    """批量预检文件，返回 (通过的文件列表, [(未通过的文件, 原因)])"""
+    passed = []
+    rejected = []
+    for file_path in file_list:
+        reason = preflight_check(file_path)
+        if reason is None:
+            passed.append(file_path)
+        else:
+            rejected.append((file_path, reason))
+            print_colored(f"预检未通过，跳过 {os.path.basename(file_path)}: {reason}", Colors.FAIL)
+    return passed, rejected
+
+
+def estimate_csv_cells(file_path):
+    """从文件开头采样估算CSV的单元格数（行数 × 首行列数），不读取整个文件"""
+    size = os.path.getsize(file_path)
+    lower_path = file_path.lower()
+    if lower_path.endswith('.gz'):
+        # gzip 尾部4字节记录了解压后的大小（对 2^32 取模）
+        with open(file_path, 'rb') as f:
+            f.seek(-4, os.SEEK_END)
+            raw_size = int.from_bytes(f.read(4), 'little')
+        while raw_size < size:
+            raw_size += 2 ** 32
+    elif lower_path.endswith(COMPRESSED_CSV_EXTENSIONS):
+        raw_size = size * PLAN_COMPRESSION_RATIO
+    else:
+        raw_size = size
+
+    with open_csv_file(file_path) as f:
+        sample = f.read(PLAN_SAMPLE_SIZE)
+    if not sample:
+        return 0
+
+    columns = len(next(csv.reader(io.StringIO(sample, newline='')), []))
+    lines = sample.count('\n') + (0 if sample.endswith('\n') else 1)
+    sampled_bytes = len(sample.encode('utf-8'))
+    if sampled_bytes >= raw_size or len(sample) < PLAN_SAMPLE_SIZE:
+        rows = lines
+    else:
+        rows = int(raw_size * lines / sampled_bytes)
+    return rows * columns
+
+
+def estimate_xlsx_cells(file_path):
+    """直接从zip读取各工作表开头的 <dimension> 范围估算单元格数，不加载工作簿"""
+    cells = 0
+    with zipfile.ZipFile(file_path) as zf:
+        for info in zf.infolist():
+            if not re.fullmatch(r'xl/worksheets/[^/]+\.xml', info.filename):
+                continue
+            with zf.open(info) as f:
+                match = DIMENSION_PATTERN.search(f.read(4096))
+            if match:
+                min_col, min_row, max_col, max_row = range_boundaries(match.group(1).decode())
+                cells += (max_row - min_row + 1) * (max_col - min_col + 1)
+            else:
+                cells += info.file_size // PLAN_SHEET_XML_BYTES_PER_CELL
+    return cells
+
+
+def estimate_columnar_cells(file_path):
+    """从Parquet/Arrow元数据读取行列数，未安装pyarrow时按文件大小粗略估算"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return os.path.getsize(file_path) // 8
+
+    if file_path.lower().endswith('.parquet'):
+        metadata = pq.read_metadata(file_path)
+        return metadata.num_rows * metadata.num_columns
+    with pa.memory_map(file_path, 'r') as source:
+        reader = pa.ipc.open_file(source)
+        rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+        return rows * len(reader.schema)
+
+
+def format_size(num_bytes):
+    """把字节数格式化为易读的大小"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+def format_duration(seconds):
+    """把秒数格式化为 时:分:秒"""
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def plan_files(file_list):
+    """预演模式：不修改任何文件，预测每个文件及整个批次的耗时、峰值内存和输出大小"""
+    plans = []
+    for file_path in file_list:
+        lower_path = file_path.lower()
+        try:
+            if is_csv_file(file_path):
+                kind, cells = 'csv', estimate_csv_cells(file_path)
+            elif lower_path.endswith(COLUMNAR_EXTENSIONS):
+                kind, cells = 'columnar', estimate_columnar_cells(file_path)
+            elif lower_path.endswith('.xls'):
+                kind, cells = 'excel', os.path.getsize(file_path) // PLAN_XLS_BYTES_PER_CELL
+            else:
+                kind, cells = 'excel', estimate_xlsx_cells(file_path)
+        except Exception as e:
+            print_colored(f"无法估算文件 {file_path}: {str(e)}", Colors.FAIL)
+            continue
+
+        costs = PLAN_COSTS[kind]
+        memory = PLAN_BASE_MEMORY + cells * costs['memory']
+        if kind == 'columnar':
+            memory += PLAN_BATCH_MEMORY
+        plans.append({
+            'file': file_path,
+            'size': os.path.getsize(file_path),
+            'cells': cells,
+            'seconds': cells * costs['seconds'],
+            'memory': memory,
+            'output': cells * costs['output'],
+        })
+
+    print_header("运行计划（预演，不修改文件）")
+    for plan in plans:
+        print_colored(f"{os.path.basename(plan['file'])}: {format_size(plan['size'])}，约 {plan['cells']:,} 个单元格，"
+                      f"预计耗时 {format_duration(plan['seconds'])}，峰值内存 {format_size(plan['memory'])}，"
+                      f"输出 {format_size(plan['output'])}", Colors.PURPLE)
+
+    if plans:
+        print_colored(f"\n合计 {len(plans)} 个文件：预计耗时 {format_duration(sum(p['seconds'] for p in plans))}，"
+                      f"峰值内存 {format_size(max(p['memory'] for p in plans))}，"
+                      f"输出 {format_size(sum(p['output'] for p in plans))}", Colors.OKGREEN)
+    return plans
+
+
+class BatchJournal:
+    """批处理进度日志
+
+    每个文件的状态（pending/in-progress/done/failed）以一行JSON追加写入并立即落盘，
+    进程崩溃后可据此恢复，最后一行写到一半时读取会被忽略。
+    """
+
+    PENDING = 'pending'
+    IN_PROGRESS = 'in-progress'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def start(self, file_list):
+        """开始新的批次：清空旧日志并把所有文件记为待处理"""
+        with open(self.path, 'w', encoding='utf-8'):
+            pass
+        for file_path in file_list:
+            self.record(file_path, self.PENDING)
+
+    def record(self, file_path, state, **extra):
+        """原子追加一条状态记录（单次write调用 + fsync）"""
+        entry = {'file': os.path.abspath(file_path), 'state': state, 'time': time.time()}
+        entry.update(extra)
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def load(self):
+        """读取日志，返回 {文件: {'state': 最新状态, 'attempts': 已尝试次数}}，保持批次中的顺序
+
+        每条 in-progress 记录算一次尝试；没有先记 in-progress 就直接记为 failed 的文件
+        （预检未通过、被隔离）也算一次尝试，避免每次恢复都重试。
+        """
+        entries = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                item = entries.setdefault(entry['file'], {'state': self.PENDING, 'attempts': 0})
+                if entry['state'] == self.IN_PROGRESS or (
+                        entry['state'] == self.FAILED and item['state'] != self.IN_PROGRESS):
+                    item['attempts'] += 1
+                item['state'] = entry['state']
+        return entries
+
+    def resumable_files(self, max_attempts):
+        """返回需要继续处理的文件：未完成且尝试次数未超过上限"""
+        return [file_path for file_path, item in self.load().items()
+                if item['state'] != self.DONE and item['attempts'] < max_attempts]
+
+    def run(self, file_path, func, *args, on_success=None, **kwargs):
+        """执行单个文件的处理并记录开始和结果状态
+
+        给出 on_success 时，处理成功后调用 on_success(file_path)，由它负责记录完成状态
+        （输出还需移动到输出目录时，移动完成才算完成）。
+        """
+        self.record(file_path, self.IN_PROGRESS)
+        try:
+            ok = func(file_path, *args, **kwargs)
+        except Exception as e:
+            self.record(file_path, self.FAILED, error=str(e))
+            print_colored(f"处理文件 {file_path} 时出错: {str(e)}", Colors.FAIL)
+            return False
+        if ok and on_success is not None:
+            on_success(file_path)
+        else:
+            self.record(file_path, self.DONE if ok else self.FAILED)
+        return ok
+
+
+class PrefetchPipeline:
+    """三段式预取流水线：读取线程预取文件字节 → 工作进程在内存中美化 → 写出线程写入备份和输出
+
+    各阶段之间是有界队列，网络共享盘上的读写等待被美化的CPU时间掩盖；下游处理不过来时上游阻塞，
+    内存中最多同时保留约 2 * queue_size + workers 个文件的数据。处理CSV和xlsx文件，
+    输出与逐个处理时相同：CSV按 csv_to_excel 转换，xlsx按 beautify_excel 美化。
+    每个输出写出后调用 on_output(源文件, 输出文件)，此时由 on_output 负责记录完成状态。输出先写入暂存目录时，final_dir 为最终的输出目录，
+    用于判断输出是否已是最新。
+    """
+
+    def __init__(self, output_dir, journal, readers=2, workers=None, writers=2, queue_size=4, force=False,
+                 on_output=None, final_dir=None):
+        self.output_dir = output_dir
+        self.final_dir = final_dir or output_dir
+        self.journal = journal
+        self.on_output = on_output
+        self.readers = readers
+        self.workers = workers or os.cpu_count() or 1
+        self.writers = writers
+        self.force = force
+        self._files = queue.Queue()
+        self._read_queue = queue.Queue(maxsize=queue_size)
+        self._write_queue = queue.Queue(maxsize=queue_size)
+        self._executor = None
+
+    def output_path(self, file_path, directory=None):
+        return os.path.join(directory or self.output_dir, output_file_name(file_path))
+
+    def _fail(self, file_path, error):
+        self.journal.record(file_path, BatchJournal.FAILED, error=str(error))
+        print_colored(f"处理文件 {file_path} 时出错: {str(error)}", Colors.FAIL)
+
+    def _read(self):
+        """读取阶段：预取文件字节，已美化过的文件直接跳过"""
+        while True:
+            try:
+                file_path = self._files.get_nowait()
+            except queue.Empty:
+                return
+            self.journal.record(file_path, BatchJournal.IN_PROGRESS)
+            try:
+                if (not self.force and not is_csv_file(file_path)
+                        and skip_beautified(file_path, self.output_path(file_path, self.final_dir))):
+                    self.journal.record(file_path, BatchJournal.DONE)
+                    continue
+                self._read_queue.put((file_path, read_file_bytes(file_path)))
+            except Exception as e:
+                self._fail(file_path, e)
+
+    def _process(self):
+        """美化阶段：把内存中的数据交给进程池美化"""
+        while True:
+            item = self._read_queue.get()
+            if item is None:
+                return
+            file_path, data = item
+            func = csv_bytes_to_xlsx if is_csv_file(file_path) else beautify_excel_bytes
+            try:
+                result = self._executor.submit(func, data).result()
+            except Exception as e:
+                self._fail(file_path, e)
+                continue
+            self._write_queue.put((file_path, result))
+
+    def _write(self):
+        """写出阶段：创建备份并原子写入输出文件"""
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                return
+            file_path, data = item
+            output_path = self.output_path(file_path)
+            try:
+                backup_existing(output_path)
+                write_file_bytes(output_path, data)
+            except Exception as e:
+                self._fail(file_path, e)
+                continue
+            if self.on_output is None:
+                self.journal.record(file_path, BatchJournal.DONE)
+            if is_csv_file(file_path):
+                print_colored(f"已将CSV文件转换为Excel: {output_path}", Colors.OKGREEN)
+            else:
+                print_colored(f"已成功美化并保存至: {output_path}", Colors.OKGREEN)
+            if self.on_output is not None:
+                self.on_output(file_path, output_path)
+
+    def run(self, file_list):
+        """处理文件列表，所有阶段结束后返回"""
+        for file_path in file_list:
+            self._files.put(file_path)
+
+        def start(target, count):
+            threads = [threading.Thread(target=target, daemon=True) for _ in range(count)]
+            for thread in threads:
+                thread.start()
+            return threads
+
+        # 各阶段线程（以及暂存搬运线程）运行期间才创建工作进程，用 spawn 避免 fork 时复制其他线程持有的锁
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as self._executor:
+            readers = start(self._read, self.readers)
+            processors = start(self._process, self.workers)
+            writers = start(self._write, self.writers)
+
+            # 上游阶段全部结束后，向下游每个线程发送结束标记
+            for stage, next_queue, next_count in ((readers, self._read_queue, len(processors)),
+                                                  (processors, self._write_queue, len(writers))):
+                for thread in stage:
+                    thread.join()
+                for _ in range(next_count):
+                    next_queue.put(None)
+            for thread in writers:
+                thread.join()
+
+
+class StagingMover:
+    """把暂存目录中的输出文件在后台移动到最终输出目录
+
+    输出先写入本地快速磁盘（如 tmpfs），搬运线程按大块顺序复制到输出目录下的临时文件，
+    落盘后重新读取校验 SHA1，一致才原子改名为最终文件，原有文件改名为 .bak 备份。
+    待搬运的文件超过 max_pending 个时提交方阻塞，避免暂存目录被占满。
+    给出 journal 时，移动成功后才把源文件记为完成，失败记为失败（暂存文件保留，重试时重新生成并提交）。
+    """
+
+    def __init__(self, staging_dir, output_dir, journal=None, max_pending=8, block_size=8 * 1024 * 1024):
+        self.staging_dir = staging_dir
+        self.output_dir = output_dir
+        self.journal = journal
+        self.block_size = block_size
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, source_path, staged_path):
+        """提交一个暂存的输出文件，source_path 为生成它的源文件（用于记录完成或失败）"""
+        self._queue.put((source_path, staged_path))
+
+    def submit_output(self, source_path):
+        """提交源文件在暂存目录中的输出；没有输出（如已是最新而跳过）时直接记为完成"""
+        staged_path = os.path.join(self.staging_dir, output_file_name(source_path))
+        if os.path.exists(staged_path):
+            self.submit(source_path, staged_path)
+        elif self.journal is not None:
+            self.journal.record(source_path, BatchJournal.DONE)
+
+    def _copy(self, src_path, dst_path):
+        """按大块顺序复制并落盘，返回内容的 SHA1"""
+        sha1 = hashlib.sha1()
+        with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+            for block in iter(lambda: src.read(self.block_size), b''):
+                sha1.update(block)
+                dst.write(block)
+            dst.flush()
+            os.fsync(dst.fileno())
+        return sha1.hexdigest()
+
+    def _checksum(self, file_path):
+        """重新读取文件计算 SHA1"""
+        sha1 = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            # 尽量丢弃页缓存，让校验读到的是目标存储上的数据
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            for block in iter(lambda: f.read(self.block_size), b''):
+                sha1.update(block)
+        return sha1.hexdigest()
+
+    def move(self, staged_path):
+        """把一个暂存文件校验后移动到输出目录，返回最终路径"""
+        output_path = os.path.join(self.output_dir, os.path.basename(staged_path))
+        tmp_path = f"{output_path}.tmp"
+        try:
+            checksum = self._copy(staged_path, tmp_path)
+            if self._checksum(tmp_path) != checksum:
+                raise IOError("校验和不一致，目标文件可能已损坏")
+            if os.path.exists(output_path):
+                os.replace(output_path, f"{output_path}.bak")
+                print_colored(f"已创建备份文件: {output_path}.bak", Colors.WARNING)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.remove(staged_path)
+        # 重试时转换函数在暂存目录中为旧输出留下的备份，真正的备份已在输出目录中
+        if os.path.exists(f"{staged_path}.bak"):
+            os.remove(f"{staged_path}.bak")
+        return output_path
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            source_path, staged_path = item
+            try:
+                output_path = self.move(staged_path)
+            except Exception as e:
+                # 文件保留在暂存目录中，进度日志记为失败，可使用 --resume 重试
+                self.failed += 1
+                print_colored(f"移动 {staged_path} 到输出目录时出错: {str(e)}", Colors.FAIL)
+                if self.journal is not None and source_path is not None:
+                    self.journal.record(source_path, BatchJournal.FAILED, error=f"移动输出失败: {e}")
+                continue
+            print_colored(f"已校验并移动到输出目录: {output_path}", Colors.OKGREEN)
+            if self.journal is not None and source_path is not None:
+                self.journal.record(source_path, BatchJournal.DONE)
+
+    def close(self):
+        """等待所有文件搬运完毕，返回失败的文件数"""
+        self._queue.put(None)
+        self._thread.join()
+        return self.failed
+
+
+def process_single_file(file_path, output_dir, workers=None, force=False, incremental=False, compact=False,
+                        string_storage='inline', preserve=False, sheets=None, encode=False,
+                        profile_cache=None, refresh_profiles=False, final_dir=None):
+    """按文件类型分派处理单个文件，成功返回 True
+
+    preserve 为 True 或指定了 sheets 时，Excel文件只改写需要美化的部件，其余部件原样复制，
+    不能与 incremental、compact、string_storage 和 profile_cache 同时使用（抛出 ValueError）；
+    encode 为 True 时CSV文件按列字典编码读取并直接输出美化后的Excel；
+    profile_cache 为表结构缓存文件路径，refresh_profiles 和 final_dir 见 beautify_excel。
+    """
+    lower_path = file_path.lower()
+    if is_csv_file(file_path):
+        if encode:
+            return encoded_csv_to_excel(file_path, output_dir, string_storage=string_storage,
+                                        profile_cache=profile_cache) is not None
+        if workers and workers > 1 and lower_path.endswith('.csv'):
+            return parallel_csv_to_excel(file_path, output_dir, workers=workers,
+                                         string_storage=string_storage) is not None
+        return csv_to_excel(file_path, output_dir, string_storage=string_storage) is not None
+    if lower_path.endswith(COLUMNAR_EXTENSIONS):
+        return columnar_to_excel(file_path, output_dir) is not None
+    if lower_path.endswith('.xls'):
+        return xls_to_excel(file_path, output_dir) is not None
+    if preserve or sheets:
+        conflict = preserve_option_conflict(preserve, sheets, incremental, compact, string_storage, profile_cache)
+        if conflict:
+            raise ValueError(conflict)
+        return parallel_beautify_excel(file_path, output_dir, workers=workers or 1, force=force, sheets=sheets,
+                                       preserve=True, final_dir=final_dir)
+    if (workers and workers > 1
+            and not incremental and not compact and string_storage == 'inline' and not profile_cache):
+        return parallel_beautify_excel(file_path, output_dir, workers=workers, force=force, final_dir=final_dir)
+    return beautify_excel(file_path, output_dir, force=force, incremental=incremental, compact=compact,
+                          string_storage=string_storage, profile_cache=profile_cache,
+                          refresh_profiles=refresh_profiles, final_dir=final_dir)
+
+
+def limited_worker(conn, memory_limit):
+    """受限子进程入口：设置内存上限后循环处理父进程发来的文件，把结果通过管道发回父进程"""
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    conn.send(('ready', os.getpid()))
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        file_path, output_dir, options = job
+        try:
+            conn.send(('ok', process_single_file(file_path, output_dir, **options)))
+        except MemoryError:
+            # 内存耗尽后进程状态不可靠，退出后由父进程重新启动
+            conn.send(('memory', None))
+            return
+        except Exception as e:
+            conn.send(('error', str(e)))
+
+
+class LimitedWorker:
+    """常驻的受限子进程：依次处理文件，只有被终止或异常退出后才重新启动
+
+    每个文件都启动新进程时，解释器启动和导入本模块的时间会计入每个文件，也会占用超时时间；
+    这里子进程就绪后才交给它文件，超时从交给子进程时开始计算。
+    """
+
+    def __init__(self, memory_limit=None):
+        self.memory_limit = memory_limit
+        self.jobs = 0
+        self._process = None
+        self._conn = None
+
+    def _start(self):
+        # 暂存搬运等后台线程可能正持有锁（如打印锁），fork 出的子进程会永远等待，因此用 spawn 启动
+        context = multiprocessing.get_context('spawn')
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(target=limited_worker, args=(child_conn, self.memory_limit), daemon=True)
+        self._process.start()
+        child_conn.close()
+        try:
+            self._conn.recv()
+        except EOFError:
+            exitcode = self.stop()
+            raise RuntimeError(f"受限子进程启动失败（退出码 {exitcode}），内存上限可能过小")
+        self.jobs = 0
+
+    def stop(self):
+        """终止子进程，返回其退出码"""
+        if self._process is None:
+            return None
+        if self._process.is_alive():
+            self._process.kill()
+        self._process.join()
+        exitcode = self._process.exitcode
+        self._conn.close()
+        self._process = self._conn = None
+        return exitcode
+
+    def run(self, file_path, output_dir, timeout=None, options=None):
+        """处理一个文件，返回 (状态, 值)
+
+        状态为 ok（值为处理结果）、error（值为错误信息）、timeout、memory 或 crash（值为退出码）；
+        后三种情况子进程已被终止，下一个文件会重新启动子进程。
+        """
+        if self._process is None or not self._process.is_alive():
+            if self._process is not None:
+                self.stop()
+            self._start()
+        self._conn.send((file_path, output_dir, options or {}))
+        self.jobs += 1
+
+        # 子进程异常退出时管道关闭，poll 会立即返回
+        result = None
+        finished = self._conn.poll(timeout)
+        if finished:
+            try:
+                result = self._conn.recv()
+            except EOFError:
+                result = None
+        if result is not None and result[0] in ('ok', 'error'):
+            return result
+        exitcode = self.stop()
+        if not finished:
+            return 'timeout', None
+        if result is not None:
+            return 'memory', None
+        return 'crash', exitcode
+
+
+# 设置了资源限制时复用的受限子进程，按内存上限区分
+_limited_workers = {}
+
+
+def quarantine_file(file_path, output_dir, reason):
+    """把有问题的源文件移入隔离目录，并记录原因"""
+    quarantine_dir = os.path.join(output_dir, QUARANTINE_DIR_NAME)
+    os.makedirs(quarantine_dir, exist_ok=True)
+    target = os.path.join(quarantine_dir, os.path.basename(file_path))
+    try:
+        shutil.move(file_path, target)
+    except OSError as e:
+        print_colored(f"无法隔离文件 {file_path}: {str(e)}", Colors.FAIL)
+        return
+    with open(f"{target}.reason.txt", 'w', encoding='utf-8') as f:
+        f.write(reason)
+    print_colored(f"已隔离文件: {target}（{reason}）", Colors.WARNING)
+
+
+def process_file_with_limits(file_path, output_dir, timeout=None, memory_limit=None, quarantine_dir=None,
+                             **options):
+    """在可终止的常驻子进程中处理单个文件，超过时间或内存上限时终止子进程并隔离源文件
+
+    memory_limit 单位为字节，仅在支持 resource 模块的系统上生效。超限时抛出异常，由批处理日志记录原因。
+    超限的源文件移入 quarantine_dir（默认为 output_dir）下的隔离目录；输出先写入暂存目录时应传入最终的输出目录。
+    子进程处理过其他文件后内存超限时，可能只是之前的文件留下的内存碎片，会在新的子进程中重试一次。
+    """
+    worker = _limited_workers.get(memory_limit)
+    if worker is None:
+        worker = _limited_workers[memory_limit] = LimitedWorker(memory_limit)
+
+    reused = worker.jobs > 0
+    status, value = worker.run(file_path, output_dir, timeout, options)
+    if status in ('memory', 'crash') and reused:
+        status, value = worker.run(file_path, output_dir, timeout, options)
+
+    if status == 'timeout':
+        reason = f"处理超时（超过 {timeout} 秒）"
+        quarantine_file(file_path, quarantine_dir or output_dir, reason)
+        raise TimeoutError(reason)
+    if status in ('memory', 'crash'):
+        reason = "超出内存上限" if status == 'memory' else f"处理进程异常退出（退出码 {value}），可能超出内存上限"
+        quarantine_file(file_path, quarantine_dir or output_dir, reason)
+        raise MemoryError(reason)
+    if status == 'error':
+        raise RuntimeError(value)
+    return value
+
+
+class WorkQueue:
+    """基于共享文件系统的无协调者工作队列
+
+    队列目录结构：
+        manifest.json        批次清单（文件列表、输出目录和处理选项）
+        locks/<任务号>.lock  通过 O_CREAT|O_EXCL 原子创建来认领任务，处理期间定期刷新修改时间续租
+        done/<任务号>.done   任务完成标记（failed/ 下为失败标记）
+    租约过期的锁视为其持有者已失效，其他工作进程可以接管。锁文件中写有本次认领的唯一令牌，
+    续租、释放和完成前都先核对令牌；租约已被接管的工作进程不再续租，处理结果也被丢弃。
+    各主机需以相同路径挂载共享目录。
+    """
+
+    def __init__(self, queue_dir, lease_seconds=300, poll_interval=5):
+        self.queue_dir = queue_dir
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.manifest_path = os.path.join(queue_dir, 'manifest.json')
+        self._tokens = {}
+
+    def _path(self, kind, task_id):
+        suffix = {'locks': 'lock', 'done': 'done', 'failed': 'failed'}[kind]
+        return os.path.join(self.queue_dir, kind, f"{task_id}.{suffix}")
+
+    def create(self, file_list, output_dir, options):
+        """写入批次清单（先写临时文件再原子改名）"""
+        for kind in ('locks', 'done', 'failed'):
+            os.makedirs(os.path.join(self.queue_dir, kind), exist_ok=True)
+        manifest = {
+            'created': time.time(),
+            'output_dir': os.path.abspath(output_dir),
+            'options': options,
+            'tasks': [{'id': f"{idx:06d}", 'file': os.path.abspath(f)} for idx, f in enumerate(file_list)],
+        }
+        tmp_path = f"{self.manifest_path}.{self.worker_id.replace(':', '_')}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def load_manifest(self):
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def is_finished(self, task_id):
+        return os.path.exists(self._path('done', task_id)) or os.path.exists(self._path('failed', task_id))
+
+    def claim(self, task_id):
+        """尝试认领任务，成功返回 True；过期的锁会被接管"""
+        lock_path = self._path('locks', task_id)
+        try:
+            fd = os.open(lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            if not self._break_stale_lock(lock_path):
+                return False
+            try:
+                fd = os.open(lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            except FileExistsError:
+                return False
+        token = f"{self.worker_id}:{os.urandom(8).hex()}"
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(token)
+        self._tokens[task_id] = token
+
+        # 认领期间其他进程可能已完成该任务
+        if self.is_finished(task_id):
+            self.release(task_id)
+            return False
+        return True
+
+    def _break_stale_lock(self, lock_path):
+        """租约过期时把锁改名移走；若移走的其实是刚被他人重建的新锁则放回"""
+        try:
+            if time.time() - os.path.getmtime(lock_path) < self.lease_seconds:
+                return False
+            stale_path = f"{lock_path}.{self.worker_id.replace(':', '_')}.stale"
+            os.rename(lock_path, stale_path)
+        except FileNotFoundError:
+            return False
+
+        if time.time() - os.path.getmtime(stale_path) < self.lease_seconds:
+            try:
+                os.link(stale_path, lock_path)
+            except FileExistsError:
+                pass
+            os.remove(stale_path)
+            return False
+        os.remove(stale_path)
+        return True
+
+    def owns(self, task_id):
+        """锁文件中仍是本进程认领时写入的令牌时返回 True"""
+        token = self._tokens.get(task_id)
+        try:
+            with open(self._path('locks', task_id), 'r', encoding='utf-8') as f:
+                return token is not None and f.read() == token
+        except FileNotFoundError:
+            return False
+
+    def renew(self, task_id):
+        """续租：刷新锁文件的修改时间；锁已丢失或被其他工作进程接管时返回 False"""
+        if not self.owns(task_id):
+            print_colored(f"任务 {task_id} 的锁已丢失", Colors.WARNING)
+            return False
+        try:
+            os.utime(self._path('locks', task_id))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def release(self, task_id):
+        """释放本进程持有的锁，不会删除其他工作进程接管后的锁"""
+        if self.owns(task_id):
+            try:
+                os.remove(self._path('locks', task_id))
+            except FileNotFoundError:
+                pass
+        self._tokens.pop(task_id, None)
+
+    def complete(self, task_id, ok, error=None):
+        """写入完成或失败标记并释放锁；租约已丢失时丢弃结果并返回 False"""
+        if not self.owns(task_id):
+            print_colored(f"[{self.worker_id}] 任务 {task_id} 的租约已被接管，丢弃本次处理结果", Colors.WARNING)
+            self._tokens.pop(task_id, None)
+            return False
+        marker = self._path('done' if ok else 'failed', task_id)
+        with open(marker, 'w', encoding='utf-8') as f:
+            json.dump({'worker': self.worker_id, 'time': time.time(), 'error': error}, f, ensure_ascii=False)
+        self.release(task_id)
+        return True
+
+    def _process_with_lease(self, task, output_dir, options):
+        """处理期间由后台线程定期续租
+
+        清单中设置了 timeout 或 memory_limit 时在可终止的子进程中处理，见 process_file_with_limits。
+        """
+        stop = threading.Event()
+
+        def keep_alive():
+            # 锁被接管后停止续租，避免刷新其他工作进程的锁
+            while not stop.wait(self.lease_seconds / 3):
+                if not self.renew(task['id']):
+                    return
+
+        renewer = threading.Thread(target=keep_alive, daemon=True)
+        renewer.start()
+        limits = {key: options[key] for key in ('timeout', 'memory_limit') if options.get(key)}
+        file_options = {key: value for key, value in options.items() if key not in ('timeout', 'memory_limit')}
+        try:
+            if limits:
+                return process_file_with_limits(task['file'], output_dir, **limits, **file_options), None
+            return process_single_file(task['file'], output_dir, **file_options), None
+        except Exception as e:
+            return False, str(e)
+        finally:
+            stop.set()
+            renewer.join()
+
+    def run_worker(self):
+        """作为工作进程认领并处理任务，直到所有任务都有完成或失败标记"""
+        manifest = self.load_manifest()
+        output_dir = manifest['output_dir']
+        options = manifest['options']
+        processed = 0
+
+        while True:
+            remaining = [task for task in manifest['tasks'] if not self.is_finished(task['id'])]
+            if not remaining:
+                break
+
+            claimed = False
+            for task in remaining:
+                if self.is_finished(task['id']) or not self.claim(task['id']):
+                    continue
+                claimed = True
+                print_colored(f"[{self.worker_id}] 认领任务 {task['id']}: {task['file']}", Colors.OKBLUE)
+                ok, error = self._process_with_lease(task, output_dir, options)
+                if self.complete(task['id'], ok, error):
+                    processed += 1
+
+            # 剩余任务都被其他工作进程持有，等待其完成或租约过期
+            if not claimed:
+                time.sleep(self.poll_interval)
+
+        print_colored(f"[{self.worker_id}] 队列已处理完毕，本进程处理了 {processed} 个文件", Colors.OKGREEN)
+        return processed
+
+
+def process_files(source_dir, output_dir, workers=None, force=False, incremental=False, compact=False,
+                  string_storage='inline', resume=False, max_attempts=3, timeout=None, memory_limit=None,
+                  preserve=False, sheets=None, encode=False, pipeline=False, staging_dir=None,
+                  profile_cache=None, refresh_profiles=False):
+    """处理指定目录下的所有CSV和Excel文件
+
+    workers 大于1时，未压缩的CSV文件使用多进程并行解析；force 为 True 时重新美化已美化过的文件；
+    incremental 为 True 时只美化Excel文件中新增的行；compact 为 True 时精简输出的样式表；
+    string_storage 为输出的字符串存储策略；preserve 为 True 时Excel文件只改写工作表和样式部件，
+    其余部件原样复制；sheets 为只需美化的工作表名称列表；encode 为 True 时CSV按列字典编码转换并美化。
+    pipeline 为 True 时CSV和xlsx文件通过预取流水线处理，读取、美化和写出三个阶段重叠进行。
+    指定 staging_dir 时输出先写入该本地暂存目录，由后台线程校验后移动到输出目录。
+    profile_cache 为表结构缓存文件路径，标题行相同的工作表复用缓存的列宽和列类型。
+    每个文件的处理状态记录在输出目录的进度日志中；resume 为 True 时跳过已完成的文件，
+    未完成和失败的文件最多尝试 max_attempts 次。
+    设置 timeout（秒）或 memory_limit（字节）时，文件依次交给常驻的受限子进程处理，超限的文件被终止并隔离。
+    """
+    conflict = preserve_option_conflict(preserve, sheets, incremental, compact, string_storage, profile_cache)
+    if conflict:
+        print_colored(conflict, Colors.FAIL)
+        return
+
+    journal = BatchJournal(os.path.join(output_dir, JOURNAL_FILE_NAME))
+
+    if resume and journal.exists():
+        # 从进度日志恢复批次，不再询问文件选择
+        print_header("恢复批处理")
+        selected_files = journal.resumable_files(max_attempts)
+        print_colored(f"从进度日志恢复，剩余 {len(selected_files)} 个文件需要处理", Colors.OKBLUE)
+        if not selected_files:
+            print_colored("没有需要继续处理的文件", Colors.OKGREEN)
+            return
+    else:
+        selected_files = discover_and_select_files(source_dir)
+        if not selected_files:
+            return
+
+        journal.start(selected_files)
+
+    # 预检：在加载之前快速排除损坏或格式不符的文件
+    selected_files, rejected = preflight_files(selected_files)
+    for file_path, reason in rejected:
+        journal.record(file_path, BatchJournal.FAILED, error=reason)
+
+    options = dict(workers=workers, force=force, incremental=incremental, compact=compact,
+                   string_storage=string_storage, preserve=preserve, sheets=sheets, encode=encode,
+                   profile_cache=profile_cache, refresh_profiles=refresh_profiles)
+
+    # 设置了时间或内存上限时，文件在可终止的常驻子进程中处理，超限的源文件隔离到输出目录下
+    runner = process_single_file
+    if timeout or memory_limit:
+        runner = process_file_with_limits
+        options.update(timeout=timeout, memory_limit=memory_limit, quarantine_dir=output_dir)
+
+    # 输出先写入本地暂存目录，由后台线程按大块顺序复制、校验后移动到输出目录；
+    # 是否已是最新仍与输出目录中的文件比较
+    mover = None
+    target_dir = output_dir
+    if staging_dir:
+        os.makedirs(staging_dir, exist_ok=True)
+        mover = StagingMover(staging_dir, output_dir, journal)
+        target_dir = staging_dir
+        options['final_dir'] = output_dir
+
+    def run_file(file_path):
+        # 使用暂存目录时，输出移动到输出目录后才记为完成
+        journal.run(file_path, runner, target_dir, on_success=mover.submit_output if mover is not None else None,
+                    **options)
+
+    # 流水线模式：CSV和xlsx文件的读取、美化和写出重叠进行，其余文件仍按下面的方式处理
+    if pipeline and (incremental or compact or string_storage != 'inline' or timeout or memory_limit
+                     or preserve or sheets or encode or profile_cache):
+        print_colored("流水线模式不支持与增量、精简、字符串策略、资源限制、部件改写或表结构缓存选项同时使用，"
+                      "改用逐个处理", Colors.WARNING)
+    elif pipeline:
+        pipelined = [f for f in selected_files if is_csv_file(f) or f.lower().endswith('.xlsx')]
+        if pipelined:
+            print_header("流水线处理")
+            print_colored(f"开始处理 {len(pipelined)} 个CSV和Excel文件...", Colors.OKBLUE)
+            PrefetchPipeline(target_dir, journal, workers=workers, force=force,
+                             on_output=mover.submit if mover is not None else None,
+                             final_dir=output_dir).run(pipelined)
+            pipelined = set(pipelined)
+            selected_files = [f for f in selected_files if f not in pipelined]
+
+    # 分离CSV和Excel文件
+    selected_csv = [f for f in selected_files if is_csv_file(f)]
+    selected_excel = [f for f in selected_files if f.lower().endswith(('.xlsx', '.xls'))]
+    selected_columnar = [f for f in selected_files if f.lower().endswith(COLUMNAR_EXTENSIONS)]
+
+    # 先处理CSV文件，转换为Excel
+    if selected_csv:
+        print_header("处理CSV文件")
+        print_colored(f"开始处理 {len(selected_csv)} 个CSV文件...", Colors.OKBLUE)
+        for csv_file in selected_csv:
+            run_file(csv_file)
+
+    # 列式文件直接按批次写出美化后的Excel
+    if selected_columnar:
+        print_header("处理列式文件")
+        print_colored(f"开始转换 {len(selected_columnar)} 个Parquet/Arrow文件...", Colors.OKBLUE)
+        for columnar_file in selected_columnar:
+            run_file(columnar_file)
+
+    # 处理所有Excel文件
+    if selected_excel:
+        print_header("处理Excel文件")
+        print_colored(f"开始美化 {len(selected_excel)} 个Excel文件...", Colors.OKBLUE)
+        for file in selected_excel:
+            run_file(file)
+
+    if mover is not None:
+        print_colored("等待暂存目录中的输出移动到输出目录...", Colors.OKBLUE)
+        mover.close()
+
+    print_header("处理完成")
+    failed = [f for f, item in journal.load().items() if item['state'] == BatchJournal.FAILED]
+    if failed:
+        print_colored(f"{len(failed)} 个文件处理失败，可使用 --resume 重试", Colors.WARNING)
+    else:
+        print_colored("所有选中的文件处理完毕", Colors.OKGREEN)
+
+
+class QueueFullError(RuntimeError):
+    """异步美化器排队的请求数已达上限"""
+
+
+class AsyncBeautifier:
+    """asyncio 原生接口：把美化/转换工作交给有界执行器，不阻塞事件循环
+
+    读写文件等I/O阶段使用线程池，解析和美化等CPU阶段使用进程池；同时执行的任务数由
+    max_concurrency 限制，等待中的请求超过 max_queue 时立即抛出 QueueFullError 作为背压。
+    取消协程时，尚未开始的任务会被撤销；进程中已经开始的任务会运行完毕，但结果被丢弃。
+
+    用法：
+        async with AsyncBeautifier(max_concurrency=4) as beautifier:
+            data = await beautifier.convert_csv_bytes(csv_bytes)
+    """
+
+    def __init__(self, max_concurrency=None, max_queue=100, io_threads=4):
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._io_executor = ThreadPoolExecutor(max_workers=io_threads)
+        self._cpu_executor = ProcessPoolExecutor(max_workers=self.max_concurrency)
+        self._semaphore = None
+        self._waiting = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """关闭执行器，取消排队中的任务"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self._cpu_executor.shutdown, cancel_futures=True))
+        self._io_executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def queue_depth(self):
+        """当前等待执行的请求数"""
+        return self._waiting
+
+    @contextlib.asynccontextmanager
+    async def _slot(self):
+        """为一个请求申请执行名额；排队数已满时拒绝，已接受的请求在各阶段不再排队"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self._waiting >= self.max_queue:
+            raise QueueFullError(f"排队请求数已达上限 {self.max_queue}")
+
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    async def _io(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io_executor, func, *args)
+
+    async def _cpu(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._cpu_executor, func, *args)
+
+    async def beautify_bytes(self, data):
+        """在进程池中美化xlsx字节，返回美化后的字节"""
+        async with self._slot():
+            return await self._cpu(beautify_excel_bytes, data)
+
+    async def convert_csv_bytes(self, data):
+        """在进程池中把CSV字节转换为美化后的xlsx字节"""
+        async with self._slot():
+            return await self._cpu(csv_bytes_to_excel, data)
+
+    async def beautify_file(self, file_path, output_path=None):
+        """读取xlsx文件、美化并写回（默认覆盖原文件），返回输出路径"""
+        output_path = output_path or file_path
+        async with self._slot():
+            data = await self._io(read_file_bytes, file_path)
+            data = await self._cpu(beautify_excel_bytes, data)
+            return await self._io(write_file_bytes, output_path, data)
+
+    async def convert_csv_file(self, csv_file_path, output_path=None):
+        """读取CSV文件并转换为美化后的xlsx文件，返回输出路径"""
+        if output_path is None:
+            output_path = os.path.join(os.path.dirname(csv_file_path), f"{csv_base_name(csv_file_path)}.xlsx")
+        async with self._slot():
+            data = await self._io(read_file_bytes, csv_file_path)
+            data = await self._cpu(csv_bytes_to_excel, data)
+            return await self._io(write_file_bytes, output_path, data)
+
+
+def warm_up_worker():
+    """预热工作进程：确保openpyxl等模块已加载"""
+    Workbook()
+    return os.getpid()
+
+
+def validate_server_options(options):
+    """校验 /process 请求中的处理选项，只允许 SERVER_PROCESS_OPTIONS 中的选项，不合法时抛出 ValueError"""
+    if not isinstance(options, dict):
+        raise ValueError("options 必须是JSON对象")
+    for name, value in options.items():
+        expected = SERVER_PROCESS_OPTIONS.get(name)
+        if expected is None:
+            raise ValueError(f"不支持的选项: {name}")
+        if not isinstance(value, expected):
+            raise ValueError(f"选项 {name} 的类型应为 {expected.__name__}")
+    if options.get('string_storage', 'inline') not in STRING_STORAGE_STRATEGIES:
+        raise ValueError(f"未知的字符串存储策略: {options['string_storage']}")
+    if not all(isinstance(name, str) for name in options.get('sheets', [])):
+        raise ValueError("sheets 必须是工作表名称列表")
+    return dict(options)
+
+
+class BeautifyRequestHandler(BaseHTTPRequestHandler):
+    """美化守护进程的HTTP请求处理
+
+    POST /process   JSON {"path": 文件路径, "output_dir": 输出目录, "options": {...}}，按路径处理文件
+    POST /beautify  请求体为xlsx字节（application/octet-stream），返回美化后的xlsx字节
+    POST /convert   请求体为UTF-8 CSV字节（text/csv），返回美化后的xlsx字节
+    GET  /health    健康检查
+
+    服务会按路径读写本机文件，只接受本机命令行工具的请求：带 Origin 头（来自浏览器网页）或
+    Host 不是本机监听地址（DNS 重绑定）的请求被拒绝，POST 请求还必须使用 SERVER_CONTENT_TYPES 中的类型，
+    网页无法不经预检就发出这样的跨域请求。
+    """
+
+    executor = None
+
+    def _send(self, status, body, content_type='application/json'):
+        if isinstance(body, dict):
+            body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _forbidden(self):
+        """请求来自浏览器网页或 Host 不是本机监听地址时发送 403 并返回 True"""
+        host, port = self.server.server_address[:2]
+        allowed_hosts = {f"{name}:{port}" for name in (host, '127.0.0.1', 'localhost', '[::1]')}
+        if 'Origin' in self.headers:
+            self._send(403, {'ok': False, 'error': "不接受来自浏览器网页的请求"})
+            return True
+        if self.headers.get('Host') not in allowed_hosts:
+            self._send(403, {'ok': False, 'error': "Host 不是本机服务地址"})
+            return True
+        return False
+
+    def do_GET(self):
+        if self._forbidden():
+            return
+        if self.path == '/health':
+            self._send(200, {'ok': True, 'pid': os.getpid()})
+        else:
+            self._send(404, {'ok': False, 'error': '未知的请求路径'})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self._forbidden():
+            return
+        content_types = SERVER_CONTENT_TYPES.get(self.path)
+        if content_types and self.headers.get_content_type() not in content_types:
+            self._send(415, {'ok': False, 'error': f"Content-Type 应为 {' 或 '.join(content_types)}"})
+            return
+        try:
+            if self.path == '/process':
+                request = json.loads(body)
+                options = validate_server_options(request.get('options', {}))
+                output_dir = request.get('output_dir') or os.path.dirname(request['path'])
+                ok = self.executor.submit(process_single_file, request['path'], output_dir, **options).result()
+                if ok:
+                    self._send(200, {'ok': True})
+                else:
+                    self._send(500, {'ok': False, 'error': "处理失败，详见服务端输出"})
+            elif self.path in ('/beautify', '/convert'):
+                func = beautify_excel_bytes if self.path == '/beautify' else csv_bytes_to_excel
+                data = self.executor.submit(func, body).result()
+                self._send(200, data, XLSX_CONTENT_TYPE)
+            else:
+                self._send(404, {'ok': False, 'error': '未知的请求路径'})
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {'ok': False, 'error': f"请求格式错误: {str(e)}"})
+        except Exception as e:
+            self._send(500, {'ok': False, 'error': str(e)})
+
+    def log_message(self, format, *args):
+        print_colored(f"[{self.address_string()}] {format % args}", Colors.OKBLUE)
+
+
+def serve(host='127.0.0.1', port=DEFAULT_SERVER_PORT, workers=None):
+    """启动常驻美化服务：预热进程池后通过本机HTTP接受美化/转换请求"""
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # 提前启动并预热所有工作进程，首个请求无需等待进程启动
+        pids = {future.result() for future in [executor.submit(warm_up_worker) for _ in range(workers)]}
+
+        BeautifyRequestHandler.executor = executor
+        server = ThreadingHTTPServer((host, port), BeautifyRequestHandler)
+
+        # 收到 SIGTERM（如由 systemd 停止）时与 Ctrl+C 一样正常退出
+        def handle_sigterm(signum, frame):
+            raise KeyboardInterrupt
+        signal.signal(signal.SIGTERM, handle_sigterm)
+
+        print_colored(f"美化服务已启动: http://{host}:{port}（{len(pids)} 个预热工作进程），按 Ctrl+C 退出",
+                      Colors.OKGREEN)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            print_colored("美化服务已停止", Colors.WARNING)
+
+
+def engine_csv_reference(fixture, output_dir):
+    """基准引擎：csv_to_excel 后再 beautify_excel"""
+    excel_path = csv_to_excel(fixture, output_dir)
+    beautify_excel(excel_path, output_dir, force=True)
+    return excel_path
+
+
+def engine_csv_stream(fixture, output_dir):
+    """管道模式引擎"""
+    excel_path = os.path.join(output_dir, f"{csv_base_name(fixture)}.xlsx")
+    with open_csv_file(fixture) as src, open(excel_path, 'wb') as dst:
+        stream_csv_to_excel(src, dst)
+    return excel_path
+
+
+def engine_csv_bytes(fixture, output_dir):
+    """内存字节引擎（守护进程与asyncio接口使用）"""
+    excel_path = os.path.join(output_dir, f"{csv_base_name(fixture)}.xlsx")
+    return write_file_bytes(excel_path, csv_bytes_to_excel(read_file_bytes(fixture)))
+
+
+def engine_csv_parallel(fixture, output_dir):
+    """多进程解析引擎（不做类型转换以便与基准比较），之后再美化"""
+    if not fixture.lower().endswith('.csv'):
+        return engine_csv_reference(fixture, output_dir)
+    excel_path = parallel_csv_to_excel(fixture, output_dir, convert_types=False)
+    beautify_excel(excel_path, output_dir, force=True)
+    return excel_path
+
+
+def engine_xlsx_reference(fixture, output_dir):
+    """基准引擎：beautify_excel"""
+    beautify_excel(fixture, output_dir, force=True)
+    return os.path.join(output_dir, os.path.basename(fixture))
+
+
+def engine_xlsx_bytes(fixture, output_dir):
+    """内存字节引擎"""
+    excel_path = os.path.join(output_dir, os.path.basename(fixture))
+    return write_file_bytes(excel_path, beautify_excel_bytes(read_file_bytes(fixture)))
+
+
+def engine_csv_merge(fixture, output_dir):
+    """合并引擎：单个CSV合并为只有一个工作表的工作簿"""
+    return merge_csv_files([fixture], os.path.join(output_dir, f"{csv_base_name(fixture)}.xlsx"))
+
+
+def engine_xlsx_parallel_sheets(fixture, output_dir):
+    """按工作表并行美化引擎"""
+    parallel_beautify_excel(fixture, output_dir, workers=2, force=True)
+    return os.path.join(output_dir, os.path.basename(fixture))
+
+
+def engine_csv_encoded(fixture, output_dir):
+    """按列字典编码引擎"""
+    return encoded_csv_to_excel(fixture, output_dir)
+
+
+def engine_csv_incremental(fixture, output_dir):
+    """增量引擎：先写入并增量美化前一半行，追加其余行后再增量美化一次"""
+    with open_csv_file(fixture) as f:
+        rows = [[value if value != '' else None for value in row] for row in csv.reader(f)]
+    # 增量美化会裁掉末尾空行，分割点前一行必须有内容，否则追加的行会上移
+    split = max(1, len(rows) // 2)
+    while split < len(rows) and not any(value is not None for value in rows[split - 1]):
+        split += 1
+
+    excel_path = os.path.join(output_dir, f"{csv_base_name(fixture)}.xlsx")
+    wb = Workbook()
+    for row in rows[:split]:
+        wb.active.append(row)
+    wb.save(excel_path)
+    if not beautify_excel(excel_path, output_dir, incremental=True):
+        return None
+
+    wb = load_workbook(excel_path)
+    for row in rows[split:]:
+        wb.active.append(row)
+    wb.save(excel_path)
+    return excel_path if beautify_excel(excel_path, output_dir, incremental=True) else None
+
+
+def engine_csv_pipeline(fixture, output_dir):
+    """预取流水线引擎，之后再美化"""
+    journal = BatchJournal(os.path.join(output_dir, JOURNAL_FILE_NAME))
+    PrefetchPipeline(output_dir, journal, readers=1, workers=1, writers=1, force=True).run([fixture])
+    excel_path = os.path.join(output_dir, output_file_name(fixture))
+    beautify_excel(excel_path, output_dir, force=True)
+    return excel_path
+
+
+def engine_xlsx_incremental(fixture, output_dir):
+    """增量引擎：连续两次增量美化，第二次没有新增行应直接跳过"""
+    for _ in range(2):
+        if not beautify_excel(fixture, output_dir, incremental=True):
+            return None
+    return os.path.join(output_dir, os.path.basename(fixture))
+
+
+def engine_xlsx_pipeline(fixture, output_dir):
+    """预取流水线引擎"""
+    journal = BatchJournal(os.path.join(output_dir, JOURNAL_FILE_NAME))
+    PrefetchPipeline(output_dir, journal, readers=1, workers=1, writers=1, force=True).run([fixture])
+    return os.path.join(output_dir, output_file_name(fixture))
+
+
+def engine_columnar_reference(fixture, output_dir):
+    """基准引擎：pyarrow 一次读入整个表，逐行写入工作簿后 beautify_excel"""
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(fixture) if fixture.lower().endswith('.parquet') else feather.read_table(fixture)
+    wb = Workbook()
+    wb.active.append(table.column_names)
+    for record in table.to_pylist():
+        wb.active.append([to_excel_value(value) for value in record.values()])
+    excel_path = os.path.join(output_dir, output_file_name(fixture))
+    wb.save(excel_path)
+    beautify_excel(excel_path, output_dir, force=True)
+    return excel_path
+
+
+def engine_columnar_batches(fixture, output_dir):
+    """按记录批次转换引擎（批次取小值，覆盖跨批次的列宽合并）"""
+    return columnar_to_excel(fixture, output_dir, batch_size=8)
+
+
+def engine_xls_reference(fixture, output_dir):
+    """基准引擎：xlrd 一次读入整个工作簿，逐表写入后 beautify_excel"""
+    import xlrd
+
+    book = xlrd.open_workbook(fixture)
+    wb = Workbook()
+    wb.remove(wb.active)
+    for sheet in book.sheets():
+        ws = wb.create_sheet(title=sheet.name)
+        for row_idx in range(sheet.nrows):
+            ws.append([xls_cell_value(cell, book.datemode) for cell in sheet.row(row_idx)])
+    if not wb.worksheets:
+        wb.create_sheet()
+    excel_path = os.path.join(output_dir, output_file_name(fixture))
+    wb.save(excel_path)
+    beautify_excel(excel_path, output_dir, force=True)
+    return excel_path
+
+
+def engine_xls_stream(fixture, output_dir):
+    """逐表逐行只写模式转换引擎"""
+    return xls_to_excel(fixture, output_dir)
+
+
+# 等价性测试中的引擎，每类输入的第一个为基准引擎
+HARNESS_ENGINES = {
+    'csv': [
+        ('csv_to_excel+beautify_excel', engine_csv_reference),
+        ('stream', engine_csv_stream),
+        ('bytes', engine_csv_bytes),
+        ('parallel', engine_csv_parallel),
+        ('merge', engine_csv_merge),
+        ('encoded', engine_csv_encoded),
+        ('incremental', engine_csv_incremental),
+        ('pipeline', engine_csv_pipeline),
+    ],
+    'xlsx': [
+        ('beautify_excel', engine_xlsx_reference),
+        ('bytes', engine_xlsx_bytes),
+        ('parallel_sheets', engine_xlsx_parallel_sheets),
+        ('incremental', engine_xlsx_incremental),
+        ('pipeline', engine_xlsx_pipeline),
+    ],
+    'columnar': [
+        ('read_table+beautify_excel', engine_columnar_reference),
+        ('columnar_to_excel', engine_columnar_batches),
+    ],
+    'xls': [
+        ('xlrd+beautify_excel', engine_xls_reference),
+        ('xls_to_excel', engine_xls_stream),
+    ],
+}
+
+# 仓库自带的等价性测试样例目录
+HARNESS_FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'fixtures')
+
+
+def harness_input_kind(file_path):
+    """返回样例文件在 HARNESS_ENGINES 中的输入类型，不支持的文件返回 None"""
+    lower = file_path.lower()
+    if is_csv_file(file_path):
+        return 'csv'
+    if lower.endswith('.xlsx'):
+        return 'xlsx'
+    if lower.endswith(COLUMNAR_EXTENSIONS):
+        return 'columnar'
+    if lower.endswith('.xls'):
+        return 'xls'
+    return None
+
+
+def describe_cell_style(cell):
+    """提取单元格中参与比较的样式属性"""
+    font, fill, border, alignment = cell.font, cell.fill, cell.border, cell.alignment
+    return (
+        (font.b, font.i, font.sz, font.color.rgb if font.color is not None else None),
+        (fill.fill_type, fill.fgColor.rgb if fill.fill_type else None),
+        tuple(getattr(border, side).style for side in ('left', 'right', 'top', 'bottom')),
+        (alignment.horizontal, alignment.vertical),
+    )
+
+
+def compare_workbooks(expected_path, actual_path, max_differences=10):
+    """按语义比较两个工作簿：单元格值、合并单元格、字体、填充、边框、对齐和列宽，返回差异描述列表"""
+    expected_wb = load_workbook(expected_path)
+    actual_wb = load_workbook(actual_path)
+    differences = []
+
+    if len(expected_wb.worksheets) != len(actual_wb.worksheets):
+        return [f"工作表数量不同: {len(expected_wb.worksheets)} != {len(actual_wb.worksheets)}"]
+
+    for expected, actual in zip(expected_wb.worksheets, actual_wb.worksheets):
+        expected_range = get_used_range(expected)
+        actual_range = get_used_range(actual)
+        if expected_range != actual_range:
+            differences.append(f"[{expected.title}] 数据范围不同: {expected_range} != {actual_range}")
+            continue
+
+        expected_merged = sorted(str(merged) for merged in expected.merged_cells.ranges)
+        actual_merged = sorted(str(merged) for merged in actual.merged_cells.ranges)
+        if expected_merged != actual_merged:
+            differences.append(f"[{expected.title}] 合并单元格不同: {expected_merged} != {actual_merged}")
+
+        max_row, max_col = expected_range
+        for col in range(1, max_col + 1):
+            letter = get_column_letter(col)
+            expected_width = round(expected.column_dimensions[letter].width or 0, 2)
+            actual_width = round(actual.column_dimensions[letter].width or 0, 2)
+            if expected_width != actual_width:
+                differences.append(f"[{expected.title}] 列 {letter} 宽度不同: {expected_width} != {actual_width}")
+
+        for row in range(1, max_row + 1):
+            for col in range(1, max_col + 1):
+                expected_cell = expected.cell(row=row, column=col)
+                actual_cell = actual.cell(row=row, column=col)
+                if expected_cell.value != actual_cell.value:
+                    differences.append(f"[{expected.title}] {expected_cell.coordinate} 值不同: "
+                                       f"{expected_cell.value!r} != {actual_cell.value!r}")
+                elif describe_cell_style(expected_cell) != describe_cell_style(actual_cell):
+                    differences.append(f"[{expected.title}] {expected_cell.coordinate} 样式不同: "
+                                       f"{describe_cell_style(expected_cell)} != {describe_cell_style(actual_cell)}")
+                if len(differences) >= max_differences:
+                    return differences
+    return differences
+
+
+def peak_memory_usage():
+    """返回当前进程及其子进程的峰值常驻内存（字节），无法获取时返回 None"""
+    if resource is None:
+        return None
+    # Linux 上 ru_maxrss 单位为 KB，macOS 为字节
+    scale = 1 if sys.platform == 'darwin' else 1024
+    own_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    # Linux 的 ru_maxrss 在 exec 后仍保留父进程的峰值，改用只统计当前进程映像的 VmHWM
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    own_peak = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return max(own_peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+
+
+def harness_worker(conn, engine, fixture, output_dir):
+    """在独立进程中运行一个引擎，测量耗时和峰值内存"""
+    start = time.perf_counter()
+    try:
+        output_path = engine(fixture, output_dir)
+        error = None
+    except Exception as e:
+        output_path, error = None, str(e)
+    elapsed = time.perf_counter() - start
+
+    conn.send((output_path, error, elapsed, peak_memory_usage()))
+    conn.close()
+
+
+def run_engine(engine, fixture, output_dir):
+    """用 spawn 方式启动干净的子进程运行引擎，避免继承父进程内存影响测量"""
+    context = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    worker = context.Process(target=harness_worker, args=(child_conn, engine, fixture, output_dir))
+    worker.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        # 先等进程退出，才能取得退出码
+        worker.join()
+        result = (None, f"进程异常退出（退出码 {worker.exitcode}）", 0, None)
+    worker.join()
+    return result
+
+
+def run_equivalence_harness(fixture_dir, engines=None):
+    """对样例目录中的每个文件运行所有引擎，与基准引擎的输出做语义比较，并记录耗时和峰值内存
+
+    返回 {'输入类型:引擎名': {'passed': 通过数, 'failed': 失败数, 'seconds': 总耗时, 'memory': 最大峰值内存}}。
+    """
+    engines = engines or HARNESS_ENGINES
+    summary = {}
+    fixtures = sorted(glob.glob(os.path.join(fixture_dir, '*')))
+
+    print_header("引擎等价性与性能测试")
+    for fixture in fixtures:
+        kind = harness_input_kind(fixture)
+        if kind is None or not engines.get(kind):
+            continue
+
+        print_colored(f"\n样例: {os.path.basename(fixture)}", Colors.OKBLUE + Colors.BRIGHT)
+        with tempfile.TemporaryDirectory() as work_dir:
+            reference_path = None
+            for index, (name, engine) in enumerate(engines[kind]):
+                output_dir = os.path.join(work_dir, str(index))
+                os.makedirs(output_dir)
+                # 每个引擎使用样例的独立副本，避免就地修改影响其他引擎
+                source = shutil.copy2(fixture, os.path.join(output_dir, os.path.basename(fixture)))
+                output_path, error, elapsed, peak_memory = run_engine(engine, source, output_dir)
+
+                stats = summary.setdefault(f"{kind}:{name}", {'passed': 0, 'failed': 0, 'seconds': 0.0, 'memory': 0})
+                stats['seconds'] += elapsed
+                stats['memory'] = max(stats['memory'], peak_memory or 0)
+
+                # 第一个引擎为基准；基准失败时其他引擎无从比较，也记为失败
+                if error or not output_path:
+                    differences = [error or "没有生成输出文件"]
+                    status = "失败"
+                elif index == 0:
+                    reference_path = output_path
+                    differences = []
+                    status = "基准"
+                elif reference_path is None:
+                    differences = ["基准引擎没有生成输出，无法比较"]
+                    status = "失败"
+                else:
+                    differences = compare_workbooks(reference_path, output_path)
+                    status = "一致" if not differences else "不一致"
+
+                stats['passed' if not differences else 'failed'] += 1
+                memory_text = format_size(peak_memory) if peak_memory else "未知"
+                print_colored(f"  {name:<30} {status:<4} 耗时 {elapsed:.3f}s  峰值内存 {memory_text}",
+                              Colors.OKGREEN if not differences else Colors.FAIL)
+                for difference in differences:
+                    print_colored(f"      {difference}", Colors.FAIL)
+
+    print_header("测试汇总")
+    for name, stats in summary.items():
+        print_colored(f"{name:<34} 通过 {stats['passed']}，失败 {stats['failed']}，总耗时 {stats['seconds']:.3f}s，"
+                      f"最大峰值内存 {format_size(stats['memory'])}",
+                      Colors.OKGREEN if not stats['failed'] else Colors.FAIL)
+    return summary
+
+
+def check_and_install_libraries():
+    """检查并安装所需库"""
+    required_libraries = ['openpyxl', 'colorama']
+    for lib in required_libraries:
+        try:
+            __import__(lib)
+        except ImportError:
+            print_colored(f"检测到未安装{lib}库，正在尝试安装...", Colors.WARNING)
+            os.system(f"pip install {lib}")
+
+
+def parse_args(argv=None):
+    """解析命令行参数，不带参数时进入交互模式"""
+    parser = argparse.ArgumentParser(description="Excel/CSV 美化工具")
+    parser.add_argument('--stream', action='store_true',
+                        help="管道模式：从stdin读取CSV，向stdout输出美化后的xlsx")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="并行处理使用的进程数（大于1时多核解析CSV、按工作表并行美化Excel）")
+    parser.add_argument('--force', action='store_true',
+                        help="忽略美化标记，强制重新美化已处理过的文件")
+    parser.add_argument('--incremental', action='store_true',
+                        help="增量模式：只美化上次美化之后追加的行")
+    parser.add_argument('--compact', action='store_true',
+                        help="保存前精简样式表（合并重复格式、删除未使用的命名样式）并报告效果")
+    parser.add_argument('--strings', choices=STRING_STORAGE_STRATEGIES, default='inline',
+                        help="字符串存储策略：inline 内联、shared 共享字符串表、adaptive 按列基数自动选择")
+    parser.add_argument('--resume', action='store_true',
+                        help="根据输出目录中的进度日志恢复中断的批处理，跳过已完成的文件")
+    parser.add_argument('--max-attempts', type=int, default=3,
+                        help="恢复时每个文件的最大尝试次数（默认3）")
+    parser.add_argument('--queue', metavar='DIR',
+                        help="共享目录工作队列：单独使用时作为工作进程认领并处理队列中的文件")
+    parser.add_argument('--enqueue', action='store_true',
+                        help="与 --queue 一起使用：选择文件并把批次清单写入队列目录，不在本机处理")
+    parser.add_argument('--lease', type=int, default=300,
+                        help="队列任务的租约时长（秒），超时未续租的任务可被其他工作进程接管")
+    parser.add_argument('--plan', action='store_true',
+                        help="预演模式：只预测所选文件的耗时、峰值内存和输出大小，不修改任何文件")
+    parser.add_argument('--timeout', type=float, default=None,
+                        help="每个文件的最长处理时间（秒），超时的文件被终止并隔离")
+    parser.add_argument('--memory-limit', type=int, default=None, metavar='MB',
+                        help="每个文件处理进程的内存上限（MB，仅类Unix系统），超限的文件被隔离")
+    parser.add_argument('--merge', metavar='FILE',
+                        help="将选中的CSV文件合并为输出目录中的一个工作簿，每个CSV一个工作表")
+    parser.add_argument('--preserve', action='store_true',
+                        help="只改写需要美化的工作表和样式部件，其余部件（图表、图片、VBA等）原样复制")
+    parser.add_argument('--sheets', type=lambda value: [name for name in value.split(',') if name],
+                        metavar='NAME[,NAME...]',
+                        help="只美化指定名称的工作表，其余工作表原样保留（隐含 --preserve）")
+    parser.add_argument('--encode', action='store_true',
+                        help="CSV按列字典编码读取，一次读取直接输出美化后的Excel，低基数列内存占用更小")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="预取流水线：后台线程预读文件、进程池美化、后台线程写出，读写与计算重叠进行")
+    parser.add_argument('--staging', metavar='DIR',
+                        help="输出先写入本地暂存目录（如 tmpfs），由后台线程校验后移动到输出目录")
+    parser.add_argument('--profile-cache', metavar='FILE',
+                        help="表结构缓存文件：标题行相同的工作表复用缓存的列宽和列类型，跳过列宽扫描")
+    parser.add_argument('--refresh-profiles', action='store_true',
+                        help="与 --profile-cache 一起使用：内容超出缓存列宽时加宽并更新缓存")
+    parser.add_argument('--harness', metavar='DIR', nargs='?', const=HARNESS_FIXTURE_DIR,
+                        help="对目录中的样例文件运行所有引擎，比较输出是否一致并记录耗时和内存"
+                             "（不指定目录时使用自带的 tests/fixtures）")
+    parser.add_argument('--serve', action='store_true',
+                        help="启动常驻美化服务（本机HTTP），工作进程预热后处理美化/转换请求")
+    parser.add_argument('--port', type=int, default=DEFAULT_SERVER_PORT,
+                        help=f"美化服务端口（默认{DEFAULT_SERVER_PORT}）")
+    parser.add_argument('--client', nargs='+', metavar='FILE',
+                        help="把文件提交给已启动的美化服务处理，输出到文件所在目录"
+                             "（频繁调用时改用只依赖标准库的 ExcelBeautifierClient.py，省去加载本模块的时间）")
+    parser.add_argument('--server', metavar='URL',
+                        help="--client 使用的服务地址（默认 http://127.0.0.1:端口）")
+    args = parser.parse_args(argv)
+
+    # 暂存目录是本机路径，队列中的任务可能由任意主机上的工作进程处理
+    if args.queue and args.staging:
+        parser.error("--staging 不能与 --queue 一起使用：暂存目录只对本机有效")
+    conflict = preserve_option_conflict(args.preserve, args.sheets, args.incremental, args.compact, args.strings,
+                                        args.profile_cache)
+    if conflict:
+        parser.error(conflict)
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # 管道模式：不打印艺术字、不询问目录
+    if args.stream:
+        sys.exit(0 if stream_csv_to_excel() else 1)
+
+    # 引擎等价性与性能测试
+    if args.harness:
+        summary = run_equivalence_harness(args.harness)
+        sys.exit(0 if all(not stats['failed'] for stats in summary.values()) else 1)
+
+    # 常驻服务与客户端
+    if args.serve:
+        serve(port=args.port, workers=args.workers)
+        sys.exit(0)
+    if args.client:
+        sys.exit(0 if send_to_server(args.client, args.server or f"http://127.0.0.1:{args.port}") else 1)
+
+    # 队列工作进程：处理选项来自批次清单，不询问目录
+    if args.queue and not args.enqueue:
+        WorkQueue(args.queue, lease_seconds=args.lease).run_worker()
+        sys.exit(0)
+
+    try:
+        # 打印程序标题艺术
+        print_colored_art()
+
+        # 打印工具标题
+        print_header("Excel/CSV 美化工具")
+
+        # 检查并安装所需库
+        check_and_install_libraries()
+
+        # 获取源目录
+        current_dir = os.getcwd()
+        source_dir = get_valid_directory(
+            f"{Colors.OKBLUE}请输入需要处理文件的目录: {Colors.ENDC}",
+            allow_default=True,
+            default_dir=current_dir
+        )
+
+        # 获取输出目录，默认使用源目录
+        output_dir = get_valid_directory(
+            f"{Colors.OKBLUE}请输入美化后文件的保存目录: {Colors.ENDC}",
+            allow_default=True,
+            default_dir=source_dir
+        )
+
+        # 预演模式：只输出运行计划
+        if args.plan:
+            plan_files(discover_and_select_files(source_dir))
+            sys.exit(0)
+
+        # 合并模式：选中的CSV写入同一个工作簿
+        if args.merge:
+            selected_files, _ = preflight_files(discover_and_select_files(source_dir))
+            selected_csv = [f for f in selected_files if is_csv_file(f)]
+            if not selected_csv:
+                print_colored("没有选中CSV文件，无法合并", Colors.WARNING)
+                sys.exit(1)
+            merge_path = os.path.join(output_dir, args.merge)
+            if not merge_path.lower().endswith('.xlsx'):
+                merge_path += '.xlsx'
+            sys.exit(0 if merge_csv_files(selected_csv, merge_path) else 1)
+
+        # 写入队列清单，由各主机上的工作进程处理
+        if args.queue:
+            selected_files, _ = preflight_files(discover_and_select_files(source_dir))
+            if selected_files:
+                WorkQueue(args.queue, lease_seconds=args.lease).create(selected_files, output_dir, dict(
+                    workers=args.workers, force=args.force, incremental=args.incremental,
+                    compact=args.compact, string_storage=args.strings,
+                    preserve=args.preserve, sheets=args.sheets, encode=args.encode,
+                    profile_cache=args.profile_cache, refresh_profiles=args.refresh_profiles,
+                    timeout=args.timeout,
+                    memory_limit=args.memory_limit * 1024 * 1024 if args.memory_limit else None))
+                print_colored(f"已将 {len(selected_files)} 个文件写入队列: {args.queue}", Colors.OKGREEN)
+            sys.exit(0)
+
+        # 处理文件
+        process_files(source_dir, output_dir, workers=args.workers, force=args.force,
+                      incremental=args.incremental, compact=args.compact, string_storage=args.strings,
+                      resume=args.resume, max_attempts=args.max_attempts, timeout=args.timeout,
+                      memory_limit=args.memory_limit * 1024 * 1024 if args.memory_limit else None,
+                      preserve=args.preserve, sheets=args.sheets, encode=args.encode, pipeline=args.pipeline,
+                      staging_dir=args.staging, profile_cache=args.profile_cache,
+                      refresh_profiles=args.refresh_profiles)
+        input(f"\n{Colors.OKBLUE}按回车键退出...{Colors.ENDC}")
+
+    except Exception as e:
+        print_colored(f"发生错误: {e}", Colors.FAIL)
+        sys.exit(1)
@@ -0,0 +1,58 @@
+"""常驻美化服务（ExcelBeautifier.py --serve）的轻量客户端
+
+只导入标准库的 json 和 urllib，不加载 openpyxl 等重型模块，每次调用的开销基本只有解释器启动：
+    python ExcelBeautifierClient.py FILE... [--server URL] [--output-dir DIR]
+"""
+import sys
+import os
+import argparse
+import json
+import urllib.error
+import urllib.request
+from colorama import init, Fore
+
+# 初始化colorama
+init(autoreset=True)
+
+# 常驻美化服务的默认端口
+DEFAULT_SERVER_PORT = 8765
+
+
+def send_to_server(file_list, server_url=None, output_dir=None):
+    """客户端：把文件路径提交给常驻美化服务处理，返回是否全部成功"""
+    server_url = (server_url or f"http://127.0.0.1:{DEFAULT_SERVER_PORT}").rstrip('/')
+    all_ok = True
+    for file_path in file_list:
+        payload = json.dumps({'path': os.path.abspath(file_path), 'output_dir': output_dir}).encode('utf-8')
+        request = urllib.request.Request(f"{server_url}/process", data=payload,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request) as response:
+                result = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            result = json.loads(e.read())
+        except urllib.error.URLError as e:
+            print(f"{Fore.RED}无法连接美化服务 {server_url}: {e.reason}")
+            return False
+
+        if result.get('ok'):
+            print(f"{Fore.GREEN}{file_path}: 完成")
+        else:
+            print(f"{Fore.RED}{file_path}: 失败（{result.get('error', '未知错误')}）")
+            all_ok = False
+    return all_ok
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="把文件提交给已启动的美化服务处理")
+    parser.add_argument('files', nargs='+', metavar='FILE', help="要处理的文件，默认输出到文件所在目录")
+    parser.add_argument('--server', metavar='URL',
+                        help=f"美化服务地址（默认 http://127.0.0.1:{DEFAULT_SERVER_PORT}）")
+    parser.add_argument('--output-dir', metavar='DIR', help="输出目录")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    output_dir = os.path.abspath(args.output_dir) if args.output_dir else None
+    sys.exit(0 if send_to_server(args.files, args.server, output_dir) else 1)
@@ -0,0 +1,53 @@
+"""批处理进度日志（BatchJournal）的测试"""
+from ExcelBeautifier import BatchJournal
+
+
+def test_load_keeps_latest_state_and_counts_attempts(tmp_path):
+    journal = BatchJournal(str(tmp_path / 'journal.jsonl'))
+    a, b, c = (str(tmp_path / name) for name in ('a.csv', 'b.csv', 'c.csv'))
+    journal.start([a, b, c])
+    journal.record(a, BatchJournal.IN_PROGRESS)
+    journal.record(a, BatchJournal.DONE)
+    journal.record(b, BatchJournal.IN_PROGRESS)
+    journal.record(b, BatchJournal.FAILED, error='boom')
+    # 预检未通过直接记为失败，也算一次尝试
+    journal.record(c, BatchJournal.FAILED, error='bad header')
+
+    entries = journal.load()
+    assert list(entries) == [a, b, c]
+    assert entries[a] == {'state': BatchJournal.DONE, 'attempts': 1}
+    assert entries[b] == {'state': BatchJournal.FAILED, 'attempts': 1}
+    assert entries[c] == {'state': BatchJournal.FAILED, 'attempts': 1}
+    assert journal.resumable_files(max_attempts=2) == [b, c]
+    assert journal.resumable_files(max_attempts=1) == []
+
+
+def test_load_ignores_torn_last_line(tmp_path):
+    journal = BatchJournal(str(tmp_path / 'journal.jsonl'))
+    a = str(tmp_path / 'a.csv')
+    journal.start([a])
+    journal.record(a, BatchJournal.IN_PROGRESS)
+    with open(journal.path, 'a', encoding='utf-8') as f:
+        f.write('{"file": "')
+
+    assert journal.load()[a] == {'state': BatchJournal.IN_PROGRESS, 'attempts': 1}
+    assert journal.resumable_files(max_attempts=3) == [a]
+
+
+def test_run_records_result_or_defers_to_on_success(tmp_path):
+    journal = BatchJournal(str(tmp_path / 'journal.jsonl'))
+    a, b = str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')
+    journal.start([a, b])
+    succeeded = []
+
+    def fail(file_path):
+        raise RuntimeError('boom')
+
+    assert not journal.run(a, fail)
+    assert journal.run(b, lambda file_path: True, on_success=succeeded.append)
+
+    entries = journal.load()
+    assert entries[a]['state'] == BatchJournal.FAILED
+    # 由 on_success 负责记录完成状态
+    assert entries[b]['state'] == BatchJournal.IN_PROGRESS
+    assert succeeded == [b]
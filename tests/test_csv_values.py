@@ -0,0 +1,31 @@
+"""并行解析CSV时的数字转换（convert_csv_value）的测试"""
+import pytest
+
+from ExcelBeautifier import convert_csv_value
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('0', 0),
+    ('12', 12),
+    ('-12.50', -12.5),
+    ('123456789012345', 123456789012345),
+    ('3.14159265358979', 3.14159265358979),
+])
+def test_converts_exact_numbers(text, expected):
+    value = convert_csv_value(text)
+    assert value == expected and type(value) is type(expected)
+
+
+@pytest.mark.parametrize('text', [
+    '1e400',                    # 超出浮点范围会变成 inf，写出后值丢失
+    '12E5',                     # 编码、型号等
+    '1.5e3',
+    '-0',
+    '-0.0',
+    '007',
+    '1234567890123456',         # 超过15位有效数字
+    '0.1234567890123456789',
+    '',
+])
+def test_keeps_lossy_numbers_as_text(text):
+    assert convert_csv_value(text) == text
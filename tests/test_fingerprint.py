@@ -0,0 +1,59 @@
+"""源文件指纹（file_fingerprint / fingerprint_matches）的测试"""
+import os
+
+import pytest
+
+import ExcelBeautifier
+from ExcelBeautifier import file_fingerprint, file_sha1, fingerprint_matches, read_source_file
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'a.csv'
+    path.write_bytes(b"a,b\n1,2\n")
+    return str(path)
+
+
+def forbid_hashing(monkeypatch):
+    def fail(file_path):
+        raise AssertionError("不应读取文件内容")
+    monkeypatch.setattr(ExcelBeautifier, 'file_sha1', fail)
+
+
+def test_read_source_file_matches_fingerprint(source):
+    data, fingerprint = read_source_file(source)
+    assert data == b"a,b\n1,2\n"
+    assert fingerprint == file_fingerprint(source)
+
+
+def test_unchanged_file_matches_without_hashing(source, monkeypatch):
+    fingerprint = file_fingerprint(source)
+    forbid_hashing(monkeypatch)
+    assert fingerprint_matches(source, fingerprint)
+
+
+def test_size_change_fails_without_hashing(source, monkeypatch):
+    fingerprint = file_fingerprint(source)
+    with open(source, 'ab') as f:
+        f.write(b"3,4\n")
+    forbid_hashing(monkeypatch)
+    assert not fingerprint_matches(source, fingerprint)
+
+
+def test_touched_file_compares_content(source):
+    fingerprint = file_fingerprint(source)
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert fingerprint_matches(source, fingerprint)
+
+    with open(source, 'wb') as f:
+        f.write(b"a,b\n9,9\n")
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10 ** 9))
+    assert not fingerprint_matches(source, fingerprint)
+
+
+def test_legacy_fingerprint_compares_content(source):
+    legacy = f"{os.path.getsize(source)}:{file_sha1(source)}"
+    assert fingerprint_matches(source, legacy)
+    assert not fingerprint_matches(source, 'stdin')
+    assert not fingerprint_matches(source, None)
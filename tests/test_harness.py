@@ -0,0 +1,55 @@
+"""引擎等价性测试（run_equivalence_harness）
+
+在 tests/fixtures 中的样例上运行所有已注册引擎，任何引擎的输出与基准引擎不一致都会失败。
+样例覆盖普通CSV、gzip压缩CSV、带幻影行的多工作表xlsx、合并单元格、Parquet和旧版xls，
+sparse.* 中的空值和空白单元格用于检查列宽的空单元格规则。
+"""
+import os
+
+from ExcelBeautifier import HARNESS_ENGINES, HARNESS_FIXTURE_DIR, engine_csv_stream, run_equivalence_harness
+
+
+def engine_broken(fixture, output_dir):
+    """不生成输出的引擎"""
+    return None
+
+
+def test_fixtures_cover_every_input_kind():
+    names = os.listdir(HARNESS_FIXTURE_DIR)
+    for extension in ('.csv', '.csv.gz', '.xlsx', '.parquet', '.xls'):
+        assert any(name.endswith(extension) for name in names), extension
+
+
+def test_all_engines_match_reference():
+    summary = run_equivalence_harness(HARNESS_FIXTURE_DIR)
+
+    expected = {f"{kind}:{name}" for kind, engines in HARNESS_ENGINES.items() for name, _ in engines}
+    assert set(summary) == expected
+    failed = {name: stats['failed'] for name, stats in summary.items() if stats['failed']}
+    assert not failed
+
+
+def test_failing_reference_fails_every_engine(tmp_path):
+    fixture = tmp_path / 'data.csv'
+    fixture.write_text("a,b\n1,2\n", encoding='utf-8')
+
+    summary = run_equivalence_harness(str(tmp_path), engines={
+        'csv': [('broken', engine_broken), ('stream', engine_csv_stream)],
+    })
+
+    assert summary['csv:broken']['failed'] == 1
+    assert summary['csv:stream']['failed'] == 1
+
+
+def engine_crash(fixture, output_dir):
+    """直接退出进程的引擎"""
+    os._exit(3)
+
+
+def test_crashed_engine_reports_exit_code(tmp_path, capsys):
+    (tmp_path / 'data.csv').write_text("a,b\n1,2\n", encoding='utf-8')
+
+    summary = run_equivalence_harness(str(tmp_path), engines={'csv': [('crash', engine_crash)]})
+
+    assert summary['csv:crash']['failed'] == 1
+    assert "退出码 3" in capsys.readouterr().out
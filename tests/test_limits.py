@@ -0,0 +1,52 @@
+"""资源限制（LimitedWorker 和 process_file_with_limits）的测试"""
+import os
+
+import pytest
+
+from ExcelBeautifier import QUARANTINE_DIR_NAME, LimitedWorker, process_file_with_limits
+
+
+@pytest.fixture
+def worker():
+    worker = LimitedWorker()
+    yield worker
+    worker.stop()
+
+
+def write_csv(path, rows):
+    path.write_text("a,b\n" + "1,2\n" * rows, encoding='utf-8')
+    return str(path)
+
+
+def test_worker_is_reused(worker, tmp_path):
+    first = write_csv(tmp_path / 'a.csv', 1)
+    second = write_csv(tmp_path / 'b.csv', 1)
+
+    assert worker.run(first, str(tmp_path), timeout=60) == ('ok', True)
+    pid = worker._process.pid
+    assert worker.run(second, str(tmp_path), timeout=60) == ('ok', True)
+    assert worker._process.pid == pid and worker.jobs == 2
+
+
+def test_timed_out_worker_is_replaced(worker, tmp_path):
+    slow = write_csv(tmp_path / 'slow.csv', 200000)
+    quick = write_csv(tmp_path / 'quick.csv', 1)
+
+    assert worker.run(slow, str(tmp_path), timeout=0.01) == ('timeout', None)
+    assert worker._process is None
+    assert worker.run(quick, str(tmp_path), timeout=60) == ('ok', True)
+
+
+def test_timeout_quarantines_source(tmp_path):
+    slow = write_csv(tmp_path / 'slow.csv', 200000)
+    output, quarantine = tmp_path / 'out', tmp_path / 'final'
+    output.mkdir()
+
+    with pytest.raises(TimeoutError):
+        process_file_with_limits(slow, str(output), timeout=0.01, quarantine_dir=str(quarantine))
+
+    assert not os.path.exists(slow)
+    assert (quarantine / QUARANTINE_DIR_NAME / 'slow.csv').exists()
+    assert not (output / QUARANTINE_DIR_NAME).exists()
+    # 启动时间不计入超时
+    assert process_file_with_limits(write_csv(tmp_path / 'quick.csv', 1), str(output), timeout=0.05)
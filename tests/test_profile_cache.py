@@ -0,0 +1,33 @@
+"""表结构缓存（SchemaProfileCache）的测试"""
+import os
+
+from ExcelBeautifier import SchemaProfileCache
+
+
+def test_save_merges_with_other_writers(tmp_path):
+    path = str(tmp_path / 'profiles.json')
+    first, second = SchemaProfileCache(path), SchemaProfileCache(path)
+    first.put(['a', 'b'], {'lengths': [1, 2], 'types': ['number', 'text']})
+    second.put(['c'], {'lengths': [3], 'types': ['text']})
+
+    first.save()
+    second.save()
+
+    cache = SchemaProfileCache(path)
+    assert cache.get(['a', 'b'])['lengths'] == [1, 2]
+    assert cache.get(['c'])['lengths'] == [3]
+    assert os.listdir(tmp_path) == ['profiles.json']
+
+
+def test_save_uses_unique_temp_files(tmp_path, monkeypatch):
+    path = str(tmp_path / 'profiles.json')
+    replaced = []
+    monkeypatch.setattr(os, 'replace', lambda src, dst: replaced.append(src))
+    for header in (['a'], ['b']):
+        cache = SchemaProfileCache(path)
+        cache.put(header, {'lengths': [1], 'types': ['text']})
+        cache.save()
+
+    # 同一进程中两次保存的临时文件也不相同，多台主机进程号相同时不会互相覆盖
+    assert len(set(replaced)) == 2
+    assert all(os.path.dirname(src) == str(tmp_path) for src in replaced)
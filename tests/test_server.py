@@ -0,0 +1,89 @@
+"""常驻美化服务请求处理（BeautifyRequestHandler）的测试"""
+import http.client
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from ExcelBeautifier import BeautifyRequestHandler, validate_server_options
+from ExcelBeautifierClient import send_to_server
+
+
+@pytest.fixture
+def server(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(BeautifyRequestHandler, 'executor', executor)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), BeautifyRequestHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+    executor.shutdown()
+
+
+def post(port, path, body, headers):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    connection.request('POST', path, body=body, headers=headers)
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, data
+
+
+def test_process_writes_output(server, tmp_path):
+    (tmp_path / 'x.csv').write_text("a,b\n1,2\n", encoding='utf-8')
+    body = json.dumps({'path': str(tmp_path / 'x.csv'), 'options': {'force': True}})
+
+    status, data = post(server, '/process', body, {'Content-Type': 'application/json'})
+
+    assert status == 200 and json.loads(data)['ok']
+    assert (tmp_path / 'x.xlsx').exists()
+
+
+@pytest.mark.parametrize('headers, expected', [
+    ({'Content-Type': 'application/json', 'Origin': 'http://evil.example'}, 403),
+    ({'Content-Type': 'application/json', 'Host': 'evil.example'}, 403),
+    ({'Content-Type': 'text/plain'}, 415),
+])
+def test_process_rejects_browser_requests(server, tmp_path, headers, expected):
+    (tmp_path / 'x.csv').write_text("a,b\n1,2\n", encoding='utf-8')
+    body = json.dumps({'path': str(tmp_path / 'x.csv')})
+
+    status, _ = post(server, '/process', body, headers)
+
+    assert status == expected
+    assert not (tmp_path / 'x.xlsx').exists()
+
+
+def test_process_rejects_unknown_options(server, tmp_path):
+    (tmp_path / 'x.csv').write_text("a,b\n1,2\n", encoding='utf-8')
+    body = json.dumps({'path': str(tmp_path / 'x.csv'), 'options': {'profile_cache': str(tmp_path / 'c.json')}})
+
+    status, _ = post(server, '/process', body, {'Content-Type': 'application/json'})
+
+    assert status == 400
+    assert not (tmp_path / 'x.xlsx').exists()
+
+
+def test_convert_requires_csv_content_type(server):
+    status, _ = post(server, '/convert', b"a,b\n1,2\n", {'Content-Type': 'application/x-www-form-urlencoded'})
+    assert status == 415
+
+    status, data = post(server, '/convert', b"a,b\n1,2\n", {'Content-Type': 'text/csv'})
+    assert status == 200 and data.startswith(b'PK')
+
+
+def test_validate_server_options():
+    assert validate_server_options({'force': True, 'sheets': ['A']}) == {'force': True, 'sheets': ['A']}
+    for options in ({'force': 'yes'}, {'string_storage': 'zip'}, {'sheets': [1]}, {'workers': 4}, []):
+        with pytest.raises(ValueError):
+            validate_server_options(options)
+
+
+def test_client_sends_json(server, tmp_path):
+    (tmp_path / 'x.csv').write_text("a,b\n1,2\n", encoding='utf-8')
+    assert send_to_server([str(tmp_path / 'x.csv')], f"http://127.0.0.1:{server}")
+    assert (tmp_path / 'x.xlsx').exists()
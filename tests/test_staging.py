@@ -0,0 +1,84 @@
+"""暂存目录（StagingMover 和 process_files 的 staging_dir）的测试"""
+import json
+import os
+
+from openpyxl import Workbook
+
+from ExcelBeautifier import JOURNAL_FILE_NAME, QUARANTINE_DIR_NAME, BatchJournal, StagingMover, process_files
+
+
+def make_workbook(path):
+    wb = Workbook()
+    wb.active.append(['a', 'b'])
+    wb.active.append([1, 2])
+    wb.save(path)
+
+
+def journal_states(output_dir):
+    with open(os.path.join(output_dir, JOURNAL_FILE_NAME), encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_mover_records_done_after_move(tmp_path):
+    staging, output = tmp_path / 'stage', tmp_path / 'out'
+    staging.mkdir()
+    output.mkdir()
+    journal = BatchJournal(str(output / JOURNAL_FILE_NAME))
+    (staging / 'a.xlsx').write_bytes(b'new')
+    (output / 'a.xlsx').write_bytes(b'old')
+
+    mover = StagingMover(str(staging), str(output), journal)
+    mover.submit_output(str(tmp_path / 'a.csv'))
+    assert mover.close() == 0
+
+    assert (output / 'a.xlsx').read_bytes() == b'new'
+    assert (output / 'a.xlsx.bak').read_bytes() == b'old'
+    assert not (staging / 'a.xlsx').exists()
+    assert journal.load()[str(tmp_path / 'a.csv')]['state'] == BatchJournal.DONE
+
+
+def test_mover_failure_keeps_staged_file(tmp_path, monkeypatch):
+    staging, output = tmp_path / 'stage', tmp_path / 'out'
+    staging.mkdir()
+    output.mkdir()
+    journal = BatchJournal(str(output / JOURNAL_FILE_NAME))
+    (staging / 'a.xlsx').write_bytes(b'data')
+    mover = StagingMover(str(staging), str(output), journal)
+    monkeypatch.setattr(mover, '_checksum', lambda path: 'mismatch')
+
+    mover.submit(str(tmp_path / 'a.csv'), str(staging / 'a.xlsx'))
+    assert mover.close() == 1
+
+    assert (staging / 'a.xlsx').exists()
+    assert not (output / 'a.xlsx').exists()
+    assert journal.load()[str(tmp_path / 'a.csv')]['state'] == BatchJournal.FAILED
+
+
+def test_staged_batch_skips_up_to_date_output(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr('builtins.input', lambda *args: '')
+    source, output, staging = tmp_path / 'src', tmp_path / 'out', tmp_path / 'stage'
+    source.mkdir()
+    output.mkdir()
+    make_workbook(str(source / 'y.xlsx'))
+
+    process_files(str(source), str(output), staging_dir=str(staging))
+    assert (output / 'y.xlsx').exists()
+    capsys.readouterr()
+
+    process_files(str(source), str(output), staging_dir=str(staging))
+    assert "输出文件已是最新，跳过" in capsys.readouterr().out
+    assert not (output / 'y.xlsx.bak').exists()
+    assert journal_states(str(output))[-1]['state'] == BatchJournal.DONE
+
+
+def test_staged_batch_quarantines_into_output_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr('builtins.input', lambda *args: '')
+    source, output, staging = tmp_path / 'src', tmp_path / 'out', tmp_path / 'stage'
+    source.mkdir()
+    output.mkdir()
+    (source / 'x.csv').write_text('a,b\n' * 2000, encoding='utf-8')
+
+    process_files(str(source), str(output), timeout=0.0001, staging_dir=str(staging))
+
+    assert (output / QUARANTINE_DIR_NAME / 'x.csv').exists()
+    assert not (staging / QUARANTINE_DIR_NAME).exists()
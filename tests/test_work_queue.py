@@ -0,0 +1,90 @@
+"""共享目录工作队列（WorkQueue）的测试"""
+import json
+import os
+import time
+
+from ExcelBeautifier import WorkQueue
+
+
+def make_queue(tmp_path, lease_seconds=300):
+    work_queue = WorkQueue(str(tmp_path / 'queue'), lease_seconds=lease_seconds, poll_interval=0.01)
+    work_queue.create([], str(tmp_path / 'out'), {})
+    return work_queue
+
+
+def expire_lock(work_queue, task_id):
+    old = time.time() - work_queue.lease_seconds - 10
+    os.utime(work_queue._path('locks', task_id), (old, old))
+
+
+def test_claim_is_exclusive(tmp_path):
+    first = make_queue(tmp_path)
+    second = WorkQueue(first.queue_dir)
+
+    assert first.claim('000000')
+    assert not second.claim('000000')
+    assert first.owns('000000') and not second.owns('000000')
+
+    first.release('000000')
+    assert second.claim('000000')
+
+
+def test_finished_task_cannot_be_claimed(tmp_path):
+    first = make_queue(tmp_path)
+    second = WorkQueue(first.queue_dir)
+
+    assert first.claim('000000')
+    assert first.complete('000000', True)
+    assert not os.path.exists(first._path('locks', '000000'))
+    assert not second.claim('000000')
+
+
+def test_stale_lock_is_taken_over(tmp_path):
+    first = make_queue(tmp_path)
+    second = WorkQueue(first.queue_dir)
+    assert first.claim('000000')
+
+    # 租约未过期时不能接管
+    assert not second.claim('000000')
+    expire_lock(first, '000000')
+    assert second.claim('000000')
+    assert second.owns('000000') and not first.owns('000000')
+
+
+def test_lost_lease_does_not_touch_new_owner(tmp_path):
+    first = make_queue(tmp_path)
+    second = WorkQueue(first.queue_dir)
+    assert first.claim('000000')
+    expire_lock(first, '000000')
+    assert second.claim('000000')
+    lock_path = second._path('locks', '000000')
+    expire_lock(second, '000000')
+    mtime = os.path.getmtime(lock_path)
+
+    # 原持有者不再续租、不能释放新持有者的锁，完成时结果被丢弃
+    assert not first.renew('000000')
+    assert os.path.getmtime(lock_path) == mtime
+    first.release('000000')
+    assert os.path.exists(lock_path)
+    assert not first.complete('000000', True)
+    assert not first.is_finished('000000')
+
+    assert second.complete('000000', True, None)
+    with open(second._path('done', '000000'), encoding='utf-8') as f:
+        assert json.load(f)['worker'] == second.worker_id
+
+
+def test_run_worker_processes_all_tasks(tmp_path):
+    source = tmp_path / 'src'
+    source.mkdir()
+    (tmp_path / 'out').mkdir()
+    files = []
+    for name in ('a.csv', 'b.csv'):
+        (source / name).write_text("x,y\n1,2\n", encoding='utf-8')
+        files.append(str(source / name))
+    work_queue = WorkQueue(str(tmp_path / 'queue'), poll_interval=0.01)
+    work_queue.create(files, str(tmp_path / 'out'), {})
+
+    assert work_queue.run_worker() == 2
+    assert (tmp_path / 'out' / 'a.xlsx').exists() and (tmp_path / 'out' / 'b.xlsx').exists()
+    assert not os.listdir(tmp_path / 'queue' / 'locks')
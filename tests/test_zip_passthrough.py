@@ -0,0 +1,96 @@
+"""原样复制zip成员（copy_zip_member_raw）的测试
+
+copy_zip_member_raw 直接操作 zipfile.ZipFile 的内部属性（fp、start_dir、filelist、NameToInfo），
+这里固定其行为，Python 升级导致 zipfile 内部变化时能及时发现。
+"""
+import io
+import struct
+import zipfile
+
+from openpyxl import Workbook, load_workbook
+
+from ExcelBeautifier import copy_zip_member_raw, strip_zip64_extra, write_workbook_parts
+
+
+class UnseekableWriter(io.RawIOBase):
+    """不可定位的输出流，zipfile 写入时会为每个成员使用数据描述符"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        return len(b)
+
+
+MEMBERS = {
+    'stored.bin': (bytes(range(256)) * 40, zipfile.ZIP_STORED),
+    'deflated.xml': (b'<row><c>value</c></row>' * 500, zipfile.ZIP_DEFLATED),
+    'nested/empty.txt': (b'', zipfile.ZIP_DEFLATED),
+}
+
+
+def build_source_zip(path):
+    stream = UnseekableWriter()
+    with zipfile.ZipFile(stream, 'w') as zf:
+        for name, (content, compress_type) in MEMBERS.items():
+            zf.writestr(name, content, compress_type=compress_type)
+    with open(path, 'wb') as f:
+        f.write(stream.data)
+
+
+def test_copy_zip_member_raw_keeps_compressed_data(tmp_path):
+    source = tmp_path / 'source.zip'
+    target = tmp_path / 'target.zip'
+    build_source_zip(source)
+
+    with zipfile.ZipFile(source) as zin:
+        assert all(info.flag_bits & 0x08 for info in zin.infolist())
+        originals = {info.filename: info for info in zin.infolist()}
+        with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                copy_zip_member_raw(zin, zout, info)
+            # 原样复制之后仍可正常追加新成员
+            zout.writestr('added.xml', b'<added/>')
+
+    with zipfile.ZipFile(target) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == list(MEMBERS) + ['added.xml']
+        for name, (content, compress_type) in MEMBERS.items():
+            info = zf.getinfo(name)
+            assert zf.read(name) == content
+            assert info.compress_type == compress_type
+            assert info.compress_size == originals[name].compress_size
+            assert info.CRC == originals[name].CRC
+            assert not info.flag_bits & 0x08
+        assert zf.read('added.xml') == b'<added/>'
+
+
+def test_strip_zip64_extra_keeps_other_records():
+    zip64 = struct.pack('<HH', 1, 16) + bytes(16)
+    timestamp = struct.pack('<HH', 0x5455, 5) + b'\x01' * 5
+    assert strip_zip64_extra(zip64 + timestamp) == timestamp
+    assert strip_zip64_extra(timestamp + zip64) == timestamp
+    assert strip_zip64_extra(b'') == b''
+
+
+def test_write_workbook_parts_copies_untouched_parts(tmp_path):
+    source = tmp_path / 'source.xlsx'
+    target = tmp_path / 'target.xlsx'
+    wb = Workbook()
+    wb.active.append(['a', 'b'])
+    wb.save(source)
+    with zipfile.ZipFile(source, 'a') as zf:
+        zf.writestr('customXml/item1.xml', b'<unknown/>')
+
+    write_workbook_parts(str(source), str(target), {'docProps/extra.xml': b'<extra/>'})
+
+    with zipfile.ZipFile(source) as zin, zipfile.ZipFile(target) as zout:
+        for info in zin.infolist():
+            assert zout.read(info.filename) == zin.read(info.filename)
+            assert zout.getinfo(info.filename).compress_size == info.compress_size
+        assert zout.read('docProps/extra.xml') == b'<extra/>'
+    assert load_workbook(target).active['B1'].value == 'b'